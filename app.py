@@ -1,12 +1,12 @@
 import logging
-import random
 from flask import render_template, redirect, url_for
 from flask_socketio import SocketIO
 from config.extensions import db, login_manager
 from config import create_app
 from models import User, TranscriptTest
-from flask_login import login_required
+from flask_login import current_user, login_required
 from routes.transcript import handle_connect, handle_transcription
+from utility.test_selection import random_test_selector
 import os
 from dotenv import load_dotenv
 
@@ -38,14 +38,14 @@ def index():
 @login_required
 
 def home():
-    tests = [test.serialize() for test in TranscriptTest.query.all()]
-    if not tests:
+    # Favor tests the user has not taken yet; only the chosen row is loaded
+    random_test = random_test_selector.pick(user_id=current_user.id)
+    if not random_test:
         return render_template('error.html', message="No tests available")
-    random_test = random.choice(tests)
     # logging.info(f'random test, {random_test}')
 
-    audio_file = random_test.get('audio_file_path')
-    srt_file = random_test.get('srt_file_path')
+    audio_file = random_test.audio_file_path
+    srt_file = random_test.srt_file_path
     return render_template('index.html', audio_file=audio_file, srt_file=srt_file, random_test=random_test)
 
 
@@ -55,5 +55,6 @@ socketio.on_event('request_transcription', handle_transcription)
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        # Primary only, a read replica gets its schema through replication
+        db.create_all(bind_key=None)
     socketio.run(app, debug=True)
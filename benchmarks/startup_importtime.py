@@ -0,0 +1,87 @@
+"""
+Startup-time benchmark for worker boot.
+
+Imports a module in a fresh interpreter with `python -X importtime`, reports the
+slowest imports by cumulative time and fails when the total import time goes over
+a threshold or when a module that should be loaded lazily shows up at import time.
+
+Usage:
+    python benchmarks/startup_importtime.py
+    python benchmarks/startup_importtime.py --module routes.transcript --max-ms 800
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+# Heavy modules that must only be imported on first use
+DEFAULT_LAZY_MODULES = ['openai', 'pydantic']
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+
+
+def run_importtime(module):
+    """Import `module` in a subprocess and return (wall_ms, [(cumulative_us, self_us, depth, name)])"""
+    env = dict(os.environ)
+    # A local database file keeps the benchmark independent of a running server
+    env.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'startup_benchmark.db'))
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        errors = [line for line in proc.stderr.splitlines() if not line.startswith('import time:')]
+        sys.stderr.write('\n'.join(errors) + '\n')
+        raise SystemExit(f'Importing {module} failed')
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((int(cumulative_us), int(self_us), len(indent) // 2, name))
+    return wall_ms, entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='app', help='Module to import (default: app)')
+    parser.add_argument('--max-ms', type=float, default=1500.0,
+                        help='Fail when total import time exceeds this many milliseconds')
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest imports to list')
+    parser.add_argument('--lazy', nargs='*', default=DEFAULT_LAZY_MODULES,
+                        help='Top-level packages that must not be imported eagerly')
+    args = parser.parse_args()
+
+    wall_ms, entries = run_importtime(args.module)
+    top_level = [entry for entry in entries if entry[2] == 0]
+    total_ms = sum(entry[0] for entry in top_level) / 1000
+
+    print(f'Import of {args.module}: {total_ms:.1f} ms import time, {wall_ms:.1f} ms wall (interpreter included)')
+    print(f'{"cumulative ms":>14} {"self ms":>9}  module')
+    # Direct imports of the target are the ones worth making lazy
+    direct = [entry for entry in entries if entry[2] == 1]
+    for cumulative_us, self_us, _, name in sorted(direct, reverse=True)[:args.top]:
+        print(f'{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}')
+
+    failures = []
+    if total_ms > args.max_ms:
+        failures.append(f'import time {total_ms:.1f} ms exceeds threshold of {args.max_ms:.1f} ms')
+    imported = {name.split('.')[0] for _, _, _, name in entries}
+    for lazy_module in args.lazy:
+        if lazy_module in imported:
+            failures.append(f'{lazy_module} is imported at startup but should be loaded lazily')
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
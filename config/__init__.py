@@ -2,6 +2,7 @@ from .config import config_dict
 from .extensions import db, login_manager, logger, migrate
 import os
 from flask import Flask
+from utility.pool_metrics import instrument_engine
 
 def create_app(config_name='development'):
     """Create and configure the app"""
@@ -20,14 +21,22 @@ def create_app(config_name='development'):
     migrate.init_app(app, db)
     login_manager.init_app(app)
 
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            instrument_engine(engine, bind_key, pre_ping=app.config['DB_POOL_PRE_PING'])
+
     # Register blueprints
     with app.app_context():
         from routes.auth import auth
         from routes.transcript import transcription
         from routes.analytics import analytics
+        from routes.admin import admin
+        from routes.media import media
         app.register_blueprint(auth, url_prefix='/auth')
         app.register_blueprint(transcription, url_prefix='/transcription')
         app.register_blueprint(analytics, url_prefix='/analytics')
+        app.register_blueprint(admin, url_prefix='/admin')
+        app.register_blueprint(media, url_prefix='/media')
 
     logger.info(f'App started: {config_name}')
     return app
\ No newline at end of file
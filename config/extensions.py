@@ -3,11 +3,13 @@ from flask_login import LoginManager
 import logging
 from flask_bcrypt import Bcrypt
 from flask_migrate import Migrate
+from .replica import RoutingSession
 
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-db = SQLAlchemy()
+# Reads wrapped with config.replica.replica_reads go to the 'replica' bind when configured
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 bcrypt = Bcrypt()
 migrate = Migrate()
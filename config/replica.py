@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from sqlalchemy import exc
+from flask_sqlalchemy.session import Session
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = 'replica'
+
+# Set while a read-only block runs, see `read_replica`
+_use_replica: ContextVar[bool] = ContextVar('use_replica', default=False)
+
+# Monotonic time until which the replica is skipped after a connection failure
+_replica_down_until = 0.0
+_replica_lock = threading.Lock()
+
+
+def replica_available() -> bool:
+    return time.monotonic() >= _replica_down_until
+
+
+def mark_replica_down(cooldown: float):
+    global _replica_down_until
+    with _replica_lock:
+        _replica_down_until = time.monotonic() + cooldown
+
+
+def replica_reachable(engine) -> bool:
+    try:
+        with engine.connect() as connection:
+            connection.exec_driver_sql('SELECT 1')
+        return True
+    except exc.DBAPIError:
+        return False
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads inside `read_replica` to the `replica` bind.
+
+    Everything else stays on the primary: reads outside a replica block, DML
+    statements, flushes, and any statement issued while the session holds
+    unflushed changes (so a request reads its own writes). Without a `replica`
+    bind, or while it is marked down, replica reads also go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and _use_replica.get() and not self._flushing
+                and not (self.new or self.dirty or self.deleted)
+                and not getattr(clause, 'is_dml', False)
+                and replica_available()):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def read_replica():
+    """Route the read-only queries of the block to the replica bind"""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def replica_reads(view):
+    """
+    Runs a read-only function with its queries on the replica bind.
+
+    If the replica cannot be reached the function is retried once on the
+    primary and the replica is skipped for REPLICA_RETRY_AFTER seconds.
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        from flask import current_app
+        from config.extensions import db
+
+        if REPLICA_BIND not in db.engines or not replica_available():
+            return view(*args, **kwargs)
+        try:
+            with read_replica():
+                return view(*args, **kwargs)
+        except (exc.OperationalError, exc.DisconnectionError) as e:
+            db.session.rollback()
+            if replica_reachable(db.engines[REPLICA_BIND]):
+                # The query itself failed, not the replica
+                raise
+            cooldown = current_app.config['REPLICA_RETRY_AFTER']
+            logger.warning(f'Replica unavailable, reading from the primary for {cooldown}s: {e}')
+            mark_replica_down(cooldown)
+            return view(*args, **kwargs)
+    return wrapped
+
+
+def execute_on_replica(statement, **kwargs):
+    """
+    `db.session.execute` on the replica bind, falling back like `replica_reads`.
+    For results consumed after the calling function returns, e.g. streamed by a
+    generator: the rows keep coming from the connection the statement ran on.
+    """
+    from config.extensions import db
+
+    return replica_reads(db.session.execute)(statement, **kwargs)
@@ -0,0 +1,58 @@
+import hmac
+import logging
+from functools import wraps
+from flask import abort, current_app, jsonify, request
+from flask_login import current_user
+from utility.pool_metrics import pool_stats
+
+
+logger = logging.getLogger(__name__)
+
+
+def is_admin():
+    return current_user.is_authenticated and current_user.username in current_app.config['ADMIN_USERNAMES']
+
+
+def admin_required(view):
+    """Allows logged-in users listed in ADMIN_USERNAMES"""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if not is_admin():
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def metrics_access(view):
+    """
+    Allows admins (see `admin_required`), or a scraper sending
+    `Authorization: Bearer <METRICS_TOKEN>` when METRICS_TOKEN is set. Only for
+    /admin/metrics: the token is a read-only credential for pool statistics.
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        token = current_app.config.get('METRICS_TOKEN')
+        header = request.headers.get('Authorization', '')
+        if token and hmac.compare_digest(header, f'Bearer {token}'):
+            return view(*args, **kwargs)
+        if not is_admin():
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def metrics():
+    """
+    Returns the connection pool statistics of the worker process serving the request.
+
+    Each worker keeps its own pools, so under several workers repeated calls report
+    different processes (see `pid`).
+    """
+    stats = pool_stats()
+    stats['engine_options'] = dict(current_app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+    stats['worker_model'] = {
+        'web_concurrency': current_app.config['WEB_CONCURRENCY'],
+        'web_threads': current_app.config['WEB_THREADS'],
+        'db_max_connections': current_app.config['DB_MAX_CONNECTIONS'],
+    }
+    return jsonify(stats)
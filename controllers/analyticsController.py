@@ -1,65 +1,823 @@
-from collections import defaultdict
+import base64
+import csv
+import io
+import json
 import logging
-from flask import render_template
-from sqlalchemy import func
+from datetime import datetime, timedelta, timezone
+from flask import Response, current_app, jsonify, request, stream_with_context
+from sqlalchemy import and_, case, cast, func, literal, not_, tuple_, union_all
 from config.extensions import db
-from models.transcript import UserTranscript
+from config.replica import execute_on_replica, replica_reads
+from models.transcript import (ActivityBucket, DataVersion, TestErrorStats, TestingSessionStats, TranscriptErrorOutcome,
+                               TranscriptTest, UserTestRollup, UserTranscript, UserTranscriptArchive)
 from models.user import User
+from utility.upsert import upsert
 
 
-def analyze():
-    top_scores = db.session.query(
-        func.concat(User.first_name, ' ', User.last_name).label('full_name'),
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(score, created_at, entry_id):
+    """Opaque keyset cursor for the leaderboard entry after which the next page starts"""
+    raw = json.dumps([score, created_at.isoformat(), entry_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        tuple: (score, created_at, entry_id) of the last entry of the previous page.
+
+    Raises:
+        ValueError: The cursor was not made by `encode_cursor`.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        score, created_at, entry_id = json.loads(raw)
+        return float(score), datetime.fromisoformat(created_at), str(entry_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'Invalid cursor: {cursor}') from e
+
+
+def _session_entries(test_id, start, end):
+    """
+    One entry per testing_id (an assessment): the average score of its
+    submissions, credited to the session's top scorer.
+
+    Unfiltered, these are the precomputed testing_session_stats rows. With a test
+    or date filter they are aggregated from the matching live submissions.
+    """
+    if test_id is None and start is None and end is None:
+        return db.select(
+            (literal('session:') + TestingSessionStats.testing_id).label('entry_id'),
+            TestingSessionStats.testing_id,
+            TestingSessionStats.average_score.label('score'),
+            TestingSessionStats.top_user_id.label('user_id'),
+            TestingSessionStats.top_created_at.label('created_at'),
+        ).subquery()
+
+    submissions = _filter(db.select(
+        UserTranscript.id,
+        UserTranscript.testing_id,
+        UserTranscript.user_id,
         UserTranscript.overall_score,
+        UserTranscript.created_at,
+    ).where(UserTranscript.testing_id.isnot(None)), test_id, start, end).subquery()
+
+    averages = db.select(
+        submissions.c.testing_id,
+        func.avg(func.coalesce(submissions.c.overall_score, 0)).label('score'),
+    ).group_by(submissions.c.testing_id).subquery()
+
+    # Top scorer of each session, first submission wins ties
+    ranked = db.select(
+        submissions.c.testing_id,
+        submissions.c.user_id,
+        submissions.c.created_at,
+        func.row_number().over(
+            partition_by=submissions.c.testing_id,
+            order_by=(submissions.c.overall_score.desc().nulls_last(), submissions.c.id)
+        ).label('position'),
+    ).subquery()
+
+    return db.select(
+        (literal('session:') + averages.c.testing_id).label('entry_id'),
+        averages.c.testing_id,
+        averages.c.score,
+        ranked.c.user_id,
+        ranked.c.created_at,
+    ).join(ranked, (ranked.c.testing_id == averages.c.testing_id) & (ranked.c.position == 1)).subquery()
+
+
+def _practice_entries(test_id, start, end):
+    """One entry per scored practice submission (no testing_id)"""
+    return _filter(db.select(
+        (literal('practice:') + cast(UserTranscript.id, db.String)).label('entry_id'),
         UserTranscript.testing_id,
-        User.id.label('user_id'),
-        UserTranscript.created_at  # Add created_at to the query
-    ).join(User, User.id == UserTranscript.user_id
-    ).order_by(UserTranscript.overall_score.desc()
-    ).all()
-
-    # Aggregate scores for the same testing_id
-    aggregated_scores = defaultdict(lambda: {'name': '', 'score': 0, 'count': 0, 'user_id': None, 'created_at': None})
-    for name, score, testing_id, user_id, created_at in top_scores:
-        if testing_id is not None:
-            entry = aggregated_scores[testing_id]
-            if entry['score'] < (score or 0):  # Update only if this score is higher
-                entry['name'] = name
-                entry['user_id'] = user_id
-                entry['created_at'] = created_at
-            entry['score'] += score if score is not None else 0
-            entry['count'] += 1
-        else:
-            # For records without testing_id, treat them individually
-            aggregated_scores[f'individual_{name}_{score}'] = {
-                'name': name, 
-                'score': score if score is not None else 0, 
-                'count': 1,
-                'user_id': user_id,
-                'created_at': created_at
+        UserTranscript.overall_score.label('score'),
+        UserTranscript.user_id,
+        UserTranscript.created_at,
+    ).where(UserTranscript.testing_id.is_(None), UserTranscript.overall_score.isnot(None)),
+        test_id, start, end).subquery()
+
+
+def _filter(query, test_id, start, end):
+    if test_id is not None:
+        query = query.where(UserTranscript.test_taken == test_id)
+    if start is not None:
+        query = query.where(UserTranscript.created_at >= start)
+    if end is not None:
+        query = query.where(UserTranscript.created_at < end)
+    return query
+
+
+def _page(entries, after, size):
+    """The first `size` entries of `entries` following the `after` key, best first"""
+    query = db.select(entries)
+    if after is not None:
+        score, created_at, entry_id = after
+        # The row-value bound lets the (score, created_at) index seek to the
+        # cursor; entry ids only break exact ties
+        query = query.where(
+            tuple_(entries.c.score, entries.c.created_at) <= tuple_(score, created_at),
+            not_(and_(entries.c.score == score, entries.c.created_at == created_at,
+                      entries.c.entry_id >= entry_id)),
+        )
+    return query.order_by(
+        entries.c.score.desc(), entries.c.created_at.desc(), entries.c.entry_id.desc()
+    ).limit(size)
+
+
+@replica_reads
+def leaderboard(size=None, cursor=None, test_id=None, start=None, end=None):
+    """
+    One page of the stats page leaderboard, best score first, with keyset
+    pagination on (score, created_at, entry id).
+
+    Assessment sessions and scored practice submissions are ranked together.
+    Each side only reads the `size` entries after the cursor, off an index when
+    unfiltered, so a page costs O(size) however long the history is.
+
+    Parameters:
+        size: Entries per page, ANALYTICS_PAGE_SIZE by default, capped at ANALYTICS_MAX_PAGE_SIZE
+        cursor: `next_cursor` of the previous page
+        test_id: Only submissions of this test
+        start, end: Only submissions created in [start, end)
+
+    Returns:
+        dict: {'entries': [...], 'next_cursor': str or None}
+
+    Raises:
+        ValueError: Invalid cursor.
+    """
+    config = current_app.config
+    size = min(max(size or config['ANALYTICS_PAGE_SIZE'], 1), config['ANALYTICS_MAX_PAGE_SIZE'])
+    after = decode_cursor(cursor) if cursor else None
+
+    # One extra row tells whether there is a next page
+    sides = [_page(entries(test_id, start, end), after, size + 1).subquery()
+             for entries in (_session_entries, _practice_entries)]
+    merged = union_all(*(db.select(side) for side in sides)).subquery()
+    rows = db.session.execute(db.select(
+        merged,
+        (User.first_name + ' ' + User.last_name).label('name'),
+    ).join(User, User.id == merged.c.user_id
+    ).order_by(merged.c.score.desc(), merged.c.created_at.desc(), merged.c.entry_id.desc()
+    ).limit(size + 1)).all()
+
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.score, last.created_at, last.entry_id)
+
+    return {
+        'entries': [
+            {
+                'entry_id': row.entry_id,
+                'name': row.name,
+                'score': round(row.score, 2),
+                'testing_id': row.testing_id,
+                'user_id': row.user_id,
+                'created_at': row.created_at.isoformat() if row.created_at else None,
             }
+            for row in rows
+        ],
+        'next_cursor': next_cursor,
+    }
+
 
-    # Calculate average scores and format the result
-    top_scores_list = [
+def _parse_date(value, inclusive_end=False):
+    """ISO date or datetime from a query argument; a bare end date includes that day"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if inclusive_end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def get_leaderboard():
+    """
+    JSON leaderboard page for `/analytics/leaderboard`.
+
+    Query arguments: limit, cursor (next_cursor of the previous page), test_id,
+    from and to (ISO dates, `to` inclusive).
+    """
+    try:
+        page = leaderboard(
+            size=request.args.get('limit', type=int),
+            cursor=request.args.get('cursor'),
+            test_id=request.args.get('test_id', type=int),
+            start=_parse_date(request.args.get('from')),
+            end=_parse_date(request.args.get('to'), inclusive_end=True),
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify(page)
+
+
+@replica_reads
+def user_stats(user_id):
+    """
+    Score trend, per-test best and average, and missed error types of one user,
+    over live and archived submissions. Every query is a range on the user's
+    (user_id, created_at) indexes or the rollup primary key.
+
+    Not cached here: the views serving it are cached by data version
+    (utility.response_cache), which every submission bumps on all workers. The
+    version is read from the replica too, so a cached entry is never older than
+    the version it is stored under.
+
+    Returns:
+        dict or None: JSON-ready stats, None when the user does not exist.
+    """
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+
+    live = db.session.execute(db.select(
+        UserTranscript.created_at, UserTranscript.overall_score,
+        UserTranscript.test_taken, UserTranscript.testing_id,
+    ).where(UserTranscript.user_id == user_id).order_by(UserTranscript.created_at)).all()
+    archived = db.session.execute(db.select(
+        UserTranscriptArchive.created_at, UserTranscriptArchive.overall_score,
+        UserTranscriptArchive.test_taken, UserTranscriptArchive.testing_id,
+        UserTranscriptArchive.error_outcomes,
+    ).where(UserTranscriptArchive.user_id == user_id).order_by(UserTranscriptArchive.created_at)).all()
+
+    trend = [
         {
-            "name": data['name'],
-            "score": round(data['score'] / data['count'], 2),
-            "testing_id": testing_id if not testing_id.startswith('individual_') else None,
-            "user_id": data['user_id'],
-            "created_at": data['created_at']  # Include created_at in the result
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+            'score': row.overall_score,
+            'test_id': row.test_taken,
+            'assessment': row.testing_id is not None,
         }
-        for testing_id, data in aggregated_scores.items()
+        for row in [*archived, *live]
     ]
 
-    # Sort the aggregated scores
-    top_scores_list.sort(key=lambda x: x['score'], reverse=True)
+    # Archived submissions are summed up in the rollups, live ones aggregated here
+    tests = {}
+    for rollup in db.session.scalars(db.select(UserTestRollup).where(UserTestRollup.user_id == user_id)):
+        tests[rollup.test_id] = {
+            'attempts': rollup.attempts,
+            'scored_attempts': rollup.scored_attempts,
+            'score_sum': rollup.score_sum,
+            'best_score': rollup.best_score,
+            'last_taken_at': rollup.last_taken_at,
+        }
+    for row in live:
+        test = tests.setdefault(row.test_taken, {
+            'attempts': 0, 'scored_attempts': 0, 'score_sum': 0.0, 'best_score': None, 'last_taken_at': None,
+        })
+        test['attempts'] += 1
+        if row.overall_score is not None:
+            test['scored_attempts'] += 1
+            test['score_sum'] += row.overall_score
+            if test['best_score'] is None or row.overall_score > test['best_score']:
+                test['best_score'] = row.overall_score
+        if row.created_at is not None and (test['last_taken_at'] is None or row.created_at > test['last_taken_at']):
+            test['last_taken_at'] = row.created_at
+
+    names = dict(db.session.execute(
+        db.select(TranscriptTest.id, TranscriptTest.name_of_test).where(TranscriptTest.id.in_(tests))).all())
+
+    missed = {}
+    for error_type, total, missed_count in db.session.execute(db.select(
+        TranscriptErrorOutcome.error_type,
+        func.count(),
+        func.sum(case((TranscriptErrorOutcome.fixed.is_(False), 1), else_=0)),
+    ).join(UserTranscript, UserTranscript.id == TranscriptErrorOutcome.user_transcript_id
+    ).where(UserTranscript.user_id == user_id
+    ).group_by(TranscriptErrorOutcome.error_type)):
+        missed[error_type] = [total, missed_count or 0]
+    for row in archived:
+        for outcome in row.error_outcomes or []:
+            counts = missed.setdefault(outcome['type'], [0, 0])
+            counts[0] += 1
+            counts[1] += 0 if outcome['fixed'] else 1
+
+    return {
+        'user': {'id': user.id, 'name': f'{user.first_name} {user.last_name}'},
+        'attempts': len(trend),
+        'trend': trend,
+        'tests': [
+            {
+                'test_id': test_id,
+                'name': names.get(test_id),
+                'attempts': test['attempts'],
+                'best_score': test['best_score'],
+                'average_score': round(test['score_sum'] / test['scored_attempts'], 2) if test['scored_attempts'] else None,
+                'last_taken_at': test['last_taken_at'].isoformat() if test['last_taken_at'] else None,
+            }
+            for test_id, test in sorted(tests.items())
+        ],
+        'missed_error_types': sorted((
+            {
+                'error_type': error_type or 'unknown',
+                'missed': missed_count,
+                'total': total,
+                'miss_rate': round(missed_count / total, 4) if total else 0.0,
+            }
+            for error_type, (total, missed_count) in missed.items()
+        ), key=lambda item: (-item['missed'], item['error_type'])),
+    }
+
+
+def get_user_stats(user_id):
+    """JSON stats of one user for `/analytics/stats/user/<user_id>/data`"""
+    stats = user_stats(user_id)
+    if stats is None:
+        return jsonify({'status': 'error', 'message': 'User not found'}), 404
+    return jsonify(stats)
+
+
+def rebuild_session_stats():
+    """
+    Recomputes every TestingSessionStats row from the live and archived
+    submissions, in one transaction.
+
+    Returns:
+        int: The number of sessions written.
+    """
+    submissions = union_all(*(
+        db.select(table.id, table.testing_id, table.user_id, table.overall_score, table.created_at)
+        .where(table.testing_id.isnot(None))
+        for table in (UserTranscript, UserTranscriptArchive)
+    )).subquery()
+    score = func.coalesce(submissions.c.overall_score, 0)
+
+    totals = db.select(
+        submissions.c.testing_id,
+        func.count().label('submissions'),
+        func.sum(score).label('score_sum'),
+        func.max(submissions.c.overall_score).label('max_score'),
+        func.min(submissions.c.created_at).label('first_submitted_at'),
+        func.max(submissions.c.created_at).label('last_submitted_at'),
+    ).group_by(submissions.c.testing_id).subquery()
+
+    # Top scorer of each session, first submission wins ties
+    ranked = db.select(
+        submissions.c.testing_id,
+        submissions.c.user_id,
+        submissions.c.created_at,
+        func.row_number().over(
+            partition_by=submissions.c.testing_id,
+            order_by=(submissions.c.overall_score.desc().nulls_last(), submissions.c.id)
+        ).label('position'),
+    ).subquery()
+
+    rows = db.select(
+        totals.c.testing_id,
+        totals.c.submissions,
+        totals.c.score_sum,
+        (totals.c.score_sum / totals.c.submissions).label('average_score'),
+        totals.c.max_score,
+        ranked.c.user_id,
+        ranked.c.created_at,
+        totals.c.first_submitted_at,
+        totals.c.last_submitted_at,
+    ).join(ranked, (ranked.c.testing_id == totals.c.testing_id) & (ranked.c.position == 1))
+
+    table = TestingSessionStats.__table__
+    db.session.execute(db.delete(table))
+    db.session.execute(db.insert(table).from_select([
+        'testing_id', 'submissions', 'score_sum', 'average_score', 'max_score',
+        'top_user_id', 'top_created_at', 'first_submitted_at', 'last_submitted_at',
+    ], rows))
+    count = db.session.scalar(db.select(func.count()).select_from(table))
+    DataVersion.bump(db.session)
+    db.session.commit()
+    logger.info(f'Rebuilt testing_session_stats for {count} sessions')
+    return count
+
+def _error_order(error_id):
+    """E2 before E10"""
+    number = error_id[1:]
+    return (0, int(number), error_id) if number.isdigit() else (1, 0, error_id)
+
+
+@replica_reads
+def test_error_heatmap(test_id):
+    """
+    Missed counts of every seeded error of a test, in transcript order, read from
+    the precomputed test_error_stats rows (one primary key range), with the
+    error texts from the test's transcripts.
+
+    Returns:
+        dict or None: JSON-ready heatmap, None when the test does not exist.
+    """
+    test = TranscriptTest.get_with_transcripts(test_id)
+    if test is None:
+        return None
+    texts = {
+        error.error_id: error
+        for error in test.introduced_errors()
+    }
+    rows = db.session.scalars(db.select(TestErrorStats).where(TestErrorStats.test_id == test_id)).all()
+
+    errors = []
+    by_type = {}
+    for row in sorted(rows, key=lambda row: _error_order(row.error_id)):
+        error = texts.get(row.error_id)
+        error_type = row.error_type or (error.error_type if error else None) or 'unknown'
+        errors.append({
+            'error_id': row.error_id,
+            'error_type': error_type,
+            'correct': error.correct_text if error else None,
+            'error': error.error_text if error else None,
+            'attempts': row.attempts,
+            'missed': row.missed,
+            'miss_rate': round(row.missed / row.attempts, 4) if row.attempts else 0.0,
+        })
+        counts = by_type.setdefault(error_type, [0, 0])
+        counts[0] += row.attempts
+        counts[1] += row.missed
 
-    logging.info(f'Top scores: {top_scores_list}')
     return {
-            'top_scores': top_scores_list,
+        'test': {'id': test.id, 'name': test.name_of_test},
+        'errors': errors,
+        'by_type': sorted((
+            {
+                'error_type': error_type,
+                'attempts': attempts,
+                'missed': missed,
+                'miss_rate': round(missed / attempts, 4) if attempts else 0.0,
+            }
+            for error_type, (attempts, missed) in by_type.items()
+        ), key=lambda item: (-item['missed'], item['error_type'])),
+    }
+
+
+def get_test_error_heatmap(test_id):
+    """JSON heatmap of one test for `/analytics/tests/<test_id>/errors/data`"""
+    heatmap = test_error_heatmap(test_id)
+    if heatmap is None:
+        return jsonify({'status': 'error', 'message': 'Test not found'}), 404
+    return jsonify(heatmap)
+
+
+def rebuild_error_stats(batch_size=1000):
+    """
+    Recomputes every TestErrorStats row, in one transaction: live error outcomes
+    with one grouped query, archived ones from the outcomes inlined on the
+    archive rows.
+
+    Returns:
+        int: The number of (test, error) rows written.
+    """
+    outcomes = TranscriptErrorOutcome
+    counts = {}
+    for test_id, error_id, error_type, attempts, missed in db.session.execute(db.select(
+        outcomes.test_id,
+        outcomes.error_id,
+        func.max(outcomes.error_type),
+        func.count(),
+        func.sum(case((outcomes.fixed.is_(False), 1), else_=0)),
+    ).group_by(outcomes.test_id, outcomes.error_id)):
+        counts[(test_id, error_id)] = [error_type, attempts, missed or 0]
+
+    archived = db.session.execute(
+        db.select(UserTranscriptArchive.test_taken, UserTranscriptArchive.error_outcomes)
+        .where(UserTranscriptArchive.error_outcomes.isnot(None)),
+        execution_options={'yield_per': batch_size})
+    for test_id, error_outcomes in archived:
+        for outcome in error_outcomes:
+            row = counts.setdefault((test_id, outcome['id']), [None, 0, 0])
+            row[0] = row[0] or outcome['type']
+            row[1] += 1
+            row[2] += 0 if outcome['fixed'] else 1
+
+    table = TestErrorStats.__table__
+    db.session.execute(db.delete(table))
+    rows = [
+        {'test_id': test_id, 'error_id': error_id, 'error_type': error_type, 'attempts': attempts, 'missed': missed}
+        for (test_id, error_id), (error_type, attempts, missed) in sorted(counts.items())
+    ]
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(db.insert(table), rows[start:start + batch_size])
+    DataVersion.bump(db.session)
+    db.session.commit()
+    logger.info(f'Rebuilt test_error_stats for {len(rows)} errors')
+    return len(rows)
+
+
+# Most buckets returned by one activity request
+MAX_ACTIVITY_BUCKETS = 2000
+
+# Range shown when the request gives no `from`
+DEFAULT_ACTIVITY_RANGE = {
+    'hour': timedelta(days=2),
+    'day': timedelta(days=90),
+    'week': timedelta(weeks=52),
+}
+
+
+def _hour_bucket(column):
+    """SQL expression truncating a timestamp to its hour"""
+    if db.engine.dialect.name == 'postgresql':
+        return func.date_trunc('hour', column)
+    return func.strftime('%Y-%m-%d %H:00:00', column)
+
+
+def refresh_activity(full=False):
+    """
+    Brings the activity_bucket rows up to date and commits, bumping the data
+    version when a bucket changed. Run by `flask analytics refresh-activity`.
+
+    Incrementally, the hour buckets from the newest stored one onwards are
+    recomputed from user_transcript, a range on its created_at index. So are
+    the hours in the ACTIVITY_REFRESH_GRACE + WRITE_BEHIND_ACK_TIMEOUT before
+    it, since a submission can commit after a refresh with an earlier created_at
+    (a write-behind batch, a long transaction). Only the hour buckets whose
+    totals changed are written; the day and week buckets holding them are then
+    summed up from the hour rows. `full` rebuilds every bucket from the live and
+    archived submissions.
+
+    Returns:
+        int: The number of hour buckets written.
+    """
+    table = ActivityBucket.__table__
+    since = None if full else db.session.scalar(
+        db.select(func.max(ActivityBucket.bucket_start)).where(ActivityBucket.granularity == 'hour'))
+    if since is not None:
+        grace = current_app.config['ACTIVITY_REFRESH_GRACE'] + current_app.config['WRITE_BEHIND_ACK_TIMEOUT']
+        since = ActivityBucket.truncate('hour', since - timedelta(seconds=grace))
+
+    hours = {}
+    for model in (UserTranscript,) if since is not None else (UserTranscript, UserTranscriptArchive):
+        bucket = _hour_bucket(model.created_at).label('bucket')
+        query = db.select(
+            bucket,
+            func.count(),
+            func.count(model.overall_score),
+            func.coalesce(func.sum(model.overall_score), 0),
+        ).where(model.created_at.isnot(None)).group_by(bucket)
+        if since is not None:
+            query = query.where(model.created_at >= since)
+        for start, submissions, scored, score_sum in db.session.execute(query):
+            start = datetime.fromisoformat(start) if isinstance(start, str) else start
+            totals = hours.setdefault(start, [0, 0, 0.0])
+            totals[0] += submissions
+            totals[1] += scored
+            totals[2] += score_sum
+
+    if since is not None:
+        stored = {
+            start: [submissions, scored, score_sum]
+            for start, submissions, scored, score_sum in db.session.execute(db.select(
+                ActivityBucket.bucket_start, ActivityBucket.submissions,
+                ActivityBucket.scored_submissions, ActivityBucket.score_sum,
+            ).where(ActivityBucket.granularity == 'hour', ActivityBucket.bucket_start >= since))
         }
+        hours = {start: totals for start, totals in hours.items() if stored.get(start) != totals}
+
+    if full:
+        db.session.execute(db.delete(table))
+    refreshed_at = datetime.now(timezone.utc)
+    _upsert_buckets('hour', hours, refreshed_at)
+
+    if hours:
+        # Day and week buckets touched by the refreshed hours, from the stored hour rows
+        for granularity in ('day', 'week'):
+            first = ActivityBucket.truncate(granularity, min(hours))
+            last = ActivityBucket.truncate(granularity, max(hours)) + ActivityBucket.GRANULARITIES[granularity]
+            buckets = {}
+            for start, submissions, scored, score_sum in db.session.execute(db.select(
+                ActivityBucket.bucket_start, ActivityBucket.submissions,
+                ActivityBucket.scored_submissions, ActivityBucket.score_sum,
+            ).where(ActivityBucket.granularity == 'hour',
+                    ActivityBucket.bucket_start >= first, ActivityBucket.bucket_start < last)):
+                totals = buckets.setdefault(ActivityBucket.truncate(granularity, start), [0, 0, 0.0])
+                totals[0] += submissions
+                totals[1] += scored
+                totals[2] += score_sum
+            _upsert_buckets(granularity, buckets, refreshed_at)
+        # Versioned /analytics responses only change with the data version
+        DataVersion.bump(db.session)
+
+    db.session.commit()
+    logger.debug(f'Refreshed {len(hours)} hour activity buckets since {since}')
+    return len(hours)
+
+
+def _upsert_buckets(granularity, buckets, refreshed_at, batch_size=500):
+    rows = [
+        {
+            'granularity': granularity,
+            'bucket_start': start,
+            'submissions': submissions,
+            'scored_submissions': scored,
+            'score_sum': score_sum,
+            'refreshed_at': refreshed_at,
+        }
+        for start, (submissions, scored, score_sum) in sorted(buckets.items())
+    ]
+    for offset in range(0, len(rows), batch_size):
+        upsert(db.session, ActivityBucket.__table__, rows[offset:offset + batch_size],
+               ['granularity', 'bucket_start'], lambda table, new: {
+                   'submissions': new.submissions,
+                   'scored_submissions': new.scored_submissions,
+                   'score_sum': new.score_sum,
+                   'refreshed_at': new.refreshed_at,
+               })
+
+
+@replica_reads
+def activity_series(granularity, start=None, end=None):
+    """
+    Submission counts and average scores per bucket, oldest first, read from the
+    materialized activity_bucket rows only.
+
+    Parameters:
+        granularity: 'hour', 'day' or 'week'
+        start, end: Buckets starting in [start, end), by default a range that
+            suits the granularity (DEFAULT_ACTIVITY_RANGE) up to now
+
+    Raises:
+        ValueError: Unknown granularity.
+    """
+    if granularity not in ActivityBucket.GRANULARITIES:
+        raise ValueError(f'Unknown granularity: {granularity}')
+    if start is None:
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        start = ActivityBucket.truncate(granularity, (end or now) - DEFAULT_ACTIVITY_RANGE[granularity])
+
+    query = db.select(ActivityBucket).where(
+        ActivityBucket.granularity == granularity, ActivityBucket.bucket_start >= start)
+    if end is not None:
+        query = query.where(ActivityBucket.bucket_start < end)
+    buckets = db.session.scalars(
+        query.order_by(ActivityBucket.bucket_start.desc()).limit(MAX_ACTIVITY_BUCKETS)).all()
+
+    return {
+        'granularity': granularity,
+        'buckets': [
+            {
+                'start': bucket.bucket_start.isoformat(),
+                'submissions': bucket.submissions,
+                'average_score': round(bucket.score_sum / bucket.scored_submissions, 2)
+                if bucket.scored_submissions else None,
+            }
+            for bucket in reversed(buckets)
+        ],
+    }
+
+
+def get_activity():
+    """
+    JSON activity series for `/analytics/activity`, as of the last
+    `refresh_activity`. Query arguments: granularity (hour, day or week), from
+    and to.
+    """
+    try:
+        granularity = request.args.get('granularity', 'day')
+        start = _parse_date(request.args.get('from'))
+        end = _parse_date(request.args.get('to'), inclusive_end=True)
+        series = activity_series(granularity, start, end)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify(series)
+
+
+EXPORT_COLUMNS = ('id', 'user_id', 'user_name', 'username', 'test_id', 'test_name',
+                  'testing_id', 'overall_score', 'created_at', 'archived')
+
+
+def iter_export_batches(start=None, end=None, batch_size=1000):
+    """
+    Every submission, archived ones first, as batches of EXPORT_COLUMNS tuples.
+
+    Rows are read through a server-side cursor (`yield_per`) in primary key
+    order, so memory use does not depend on the size of the history, from the
+    read replica when there is one.
+
+    Parameters:
+        start, end: Only submissions created in [start, end)
+        batch_size: Rows fetched per round trip and yielded per batch
+    """
+    for table, archived in ((UserTranscriptArchive, True), (UserTranscript, False)):
+        query = db.select(
+            table.id,
+            table.user_id,
+            (User.first_name + ' ' + User.last_name).label('user_name'),
+            User.username,
+            table.test_taken,
+            TranscriptTest.name_of_test,
+            table.testing_id,
+            table.overall_score,
+            table.created_at,
+        ).join(User, User.id == table.user_id
+        ).join(TranscriptTest, TranscriptTest.id == table.test_taken
+        ).order_by(table.id)
+        if start is not None:
+            query = query.where(table.created_at >= start)
+        if end is not None:
+            query = query.where(table.created_at < end)
+
+        # The rows are fetched as the generator is consumed, after any decorated view has returned
+        result = execute_on_replica(query, execution_options={'yield_per': batch_size})
+        for partition in result.partitions():
+            yield [(*row, archived) for row in partition]
+
+
+def _csv_row(row):
+    created_at = row[8]
+    return row[:8] + (created_at.isoformat() if created_at else None, row[9])
+
+
+def iter_export_csv(start=None, end=None, batch_size=1000):
+    """The export as CSV text, one chunk per batch of rows, header first"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in iter_export_batches(start, end, batch_size):
+        writer.writerows(map(_csv_row, batch))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def write_export_csv(path, start=None, end=None, batch_size=1000):
+    """
+    Writes the export to a CSV file.
+
+    Returns:
+        int: The number of rows written.
+    """
+    written = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        for batch in iter_export_batches(start, end, batch_size):
+            writer.writerows(map(_csv_row, batch))
+            written += len(batch)
+    logger.info(f'Exported {written} submissions to {path}')
+    return written
+
+
+def write_export_parquet(path, start=None, end=None, row_group_size=50000, batch_size=1000):
+    """
+    Writes the export to a Parquet file, one row group per `row_group_size` rows.
+    Needs pyarrow, which is not a dependency of the web app.
+
+    Returns:
+        int: The number of rows written.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError('Parquet export needs pyarrow: pip install pyarrow') from e
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('user_id', pa.int64()),
+        ('user_name', pa.string()),
+        ('username', pa.string()),
+        ('test_id', pa.int64()),
+        ('test_name', pa.string()),
+        ('testing_id', pa.string()),
+        ('overall_score', pa.float64()),
+        ('created_at', pa.timestamp('us')),
+        ('archived', pa.bool_()),
+    ])
+    written = 0
+    pending = []
+
+    def write_row_group(writer, rows):
+        columns = list(zip(*rows)) or [()] * len(schema)
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema))
+
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in iter_export_batches(start, end, batch_size):
+            pending.extend(batch)
+            written += len(batch)
+            while len(pending) >= row_group_size:
+                write_row_group(writer, pending[:row_group_size])
+                del pending[:row_group_size]
+        if pending or not written:
+            write_row_group(writer, pending)
+    logger.info(f'Exported {written} submissions to {path}')
+    return written
+
 
-# get number of tests taken
-# get highest scores per user (top 10)
-# tests taken over time
-# export scores
+def export_scores_csv():
+    """
+    Streams the score export as CSV for `/analytics/export.csv`, optionally
+    limited with `from` and `to` (ISO dates, `to` inclusive).
+    """
+    try:
+        start = _parse_date(request.args.get('from'))
+        end = _parse_date(request.args.get('to'), inclusive_end=True)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    filename = f'scores-{datetime.now():%Y%m%d}.csv'
+    return Response(
+        stream_with_context(iter_export_csv(start, end)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'},
+    )
@@ -0,0 +1,102 @@
+import logging
+import os
+import re
+from flask import abort, current_app, send_from_directory, url_for
+from werkzeug.security import safe_join
+from config.extensions import db
+from models import TranscriptTest
+from utility.uploads import store_upload
+
+
+logger = logging.getLogger(__name__)
+
+AUDIO_FOLDER = os.path.abspath('static/audio')
+# Stored audio_file_path values are relative to the static folder
+AUDIO_PATH_PREFIX = '/audio/'
+# Hex digits of the content hash used in URLs
+FINGERPRINT_LENGTH = 16
+# Uploads are named by their SHA-256 (utility.uploads), older files by test id
+# until `flask media content-address-audio` renames them
+CONTENT_ADDRESSED = re.compile(r'^([0-9a-f]{64})\.\w+$')
+
+
+def audio_fingerprint(filename):
+    """
+    Content hash prefix of a content-addressed audio file name, read from the
+    name itself; None for any other name.
+    """
+    match = CONTENT_ADDRESSED.match(filename)
+    return match.group(1)[:FINGERPRINT_LENGTH] if match else None
+
+
+def audio_url(audio_file_path):
+    """
+    Fingerprinted URL for a test's `audio_file_path`. Content-addressed files get a
+    new name, hence a new URL, whenever the content changes, so it can be cached
+    forever. Computed from the path alone: no file is read or hashed. Files not yet
+    content-addressed, or outside the audio folder, keep their plain static URL.
+    """
+    if not audio_file_path:
+        return audio_file_path
+    if audio_file_path.startswith(AUDIO_PATH_PREFIX):
+        filename = audio_file_path[len(AUDIO_PATH_PREFIX):]
+        fingerprint = audio_fingerprint(filename)
+        if fingerprint:
+            return url_for('media.audio', fingerprint=fingerprint, filename=filename)
+    return url_for('static', filename=audio_file_path)
+
+
+def serve_audio(fingerprint, filename):
+    """
+    Sends a content-addressed audio file with Range support (206 partial
+    responses, so seeking does not download the file again) through the server's
+    file wrapper, i.e. sendfile under gunicorn, or X-Sendfile when USE_X_SENDFILE
+    is set. The URL names the content, so the response is cached as immutable.
+    """
+    if audio_fingerprint(filename) != fingerprint:
+        abort(404)
+
+    response = send_from_directory(
+        AUDIO_FOLDER, filename, conditional=True, max_age=current_app.config['AUDIO_CACHE_MAX_AGE'])
+    # Werkzeug only sets it on 206 responses; players check it on the first one
+    response.headers.setdefault('Accept-Ranges', 'bytes')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def content_address_audio():
+    """
+    Moves the audio files of tests created before uploads were content-addressed
+    to `<sha256><extension>` (utility.uploads.store_upload) and points the tests
+    at the new name, so their URLs carry a fingerprint without hashing anything
+    per request. Each file is committed on its own and removed once no test
+    refers to it; a file shared by several tests is stored once.
+
+    Returns:
+        tuple: (files renamed, files missing).
+    """
+    paths = db.session.scalars(
+        db.select(TranscriptTest.audio_file_path).distinct()
+        .where(TranscriptTest.audio_file_path.startswith(AUDIO_PATH_PREFIX))
+        .order_by(TranscriptTest.audio_file_path)).all()
+    renamed = missing = 0
+    for path in paths:
+        filename = path[len(AUDIO_PATH_PREFIX):]
+        if audio_fingerprint(filename):
+            continue
+        source = safe_join(AUDIO_FOLDER, filename)
+        if source is None or not os.path.isfile(source):
+            logger.warning(f"Audio file {path} not found, left as it is")
+            missing += 1
+            continue
+
+        with open(source, 'rb') as file:
+            stored = store_upload(file, AUDIO_FOLDER, os.path.splitext(filename)[1])
+        db.session.execute(db.update(TranscriptTest).where(TranscriptTest.audio_file_path == path)
+                           .values(audio_file_path=f'{AUDIO_PATH_PREFIX}{stored.filename}'))
+        db.session.commit()
+        os.remove(source)
+        logger.info(f"Renamed audio file {path} to {stored.filename}")
+        renamed += 1
+    return renamed, missing
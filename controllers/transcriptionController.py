@@ -1,30 +1,47 @@
+import multiprocessing
 import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from typing import List
-from venv import logger
-from flask import json, jsonify, request
+from flask import current_app, has_app_context, json, jsonify, request
 from flask_login import current_user
 import logging
-from openai import OpenAI, beta
-import openai
 from config.extensions import db
-from models import TranscriptTest, UserTranscript
-from datetime import datetime
-from werkzeug.utils import secure_filename
-from pydantic import BaseModel
+from config.replica import replica_reads
+from controllers.mediaController import AUDIO_FOLDER, audio_url
+from models import TranscriptTest, UserTranscript, TranscriptErrorOutcome, UserTranscriptArchive, UserTestRollup, TestingSessionStats, TestErrorStats, DataVersion, TestImportJob
+from datetime import datetime, timezone
 from flask import render_template
 import json
-from utility import transcript_compare
+from utility import test_import, test_ingest, transcript_compare, transcript_delta
+from utility.circuit_breaker import CircuitBreaker
+from utility.test_selection import random_test_selector
+from utility.uploads import CHUNK_SIZE, store_upload
+from utility.write_behind import WriteBehindBuffer, row_values
 
 
-openai.api_key = os.environ["OPENAI_API_KEY"]
 logger = logging.getLogger(__name__)
-client = OpenAI()
 
 # id will be used to get the correct transcript from the database to compare
 
-def aiEvaluation(user_transcript, correct_transcript, scoring_function_eval):
+AI_EVALUATION_ERROR = "Error in AI evaluation"
+AI_EVALUATION_PARAMS = {
+    'model': "gpt-4",
+    'temperature': 0.0,
+    'max_tokens': 300,
+    'top_p': 1.0,
+    'frequency_penalty': 0.0,
+    'presence_penalty': 0.0,
+}
+
+
+def build_evaluation_messages(user_transcript, correct_transcript, scoring_function_eval):
         """
-        Evaluates a user's transcript to provide additional feedback and a possible score adjustment.
+        Builds the chat messages sent to the model for an AI evaluation.
         """
         scoring_function_eval = str(scoring_function_eval)
         
@@ -55,10 +72,7 @@ def aiEvaluation(user_transcript, correct_transcript, scoring_function_eval):
                             "total_errors": 2
                         }
         converted_example_evaluation = json.dumps(example_evaluation)
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
+        return [
                     {"role": "system", "content": f"""You are an AI assistant tasked with evaluating and potentially adjusting scores based on user transcripts. This review is necessary because the scoring system is not always able to catch punctuation corrections.
                     Here's what you need to do:
 
@@ -83,23 +97,312 @@ def aiEvaluation(user_transcript, correct_transcript, scoring_function_eval):
 
                     Based on this information, provide your analysis and any score adjustments."""},
                     {"role": "user", "content": f"Compare the following user transcript to the correct transcript and provide feedback. User transcript: {user_transcript}. Correct transcript: {correct_transcript}. Initial score evaluation: {scoring_function_eval}"}
-                ],
-                temperature=0.0,
-                max_tokens=300,
-                top_p=1.0,
-                frequency_penalty=0.0,
-                presence_penalty=0.0
+                ]
+
+
+def aiEvaluation(user_transcript, correct_transcript, scoring_function_eval):
+        """
+        Evaluates a user's transcript to provide additional feedback and a possible score adjustment.
+        """
+        try:
+            response = get_openai_client().chat.completions.create(
+                messages=build_evaluation_messages(
+                    user_transcript, correct_transcript, scoring_function_eval),
+                **AI_EVALUATION_PARAMS
             )
             ai_response = response.choices[0].message.content
             return ai_response
         except Exception as e:
             logger.error(f"Error in AI evaluation: {str(e)}")
-            return "Error in AI evaluation"
-    
+            return AI_EVALUATION_ERROR
+
+
+_ai_lock = threading.Lock()
+_ai_breaker = None
+_ai_executor = None
+_openai_client = None
+_submission_buffer = None
+_ingest_executor = None
+_import_executor = None
+
+
+def get_openai_client():
+    """
+    Returns the shared OpenAI client, importing the SDK and building the client
+    on first use so that importing this module stays cheap for every worker.
+    """
+    global _openai_client
+    with _ai_lock:
+        if _openai_client is None:
+            from openai import OpenAI
+
+            timeout = 30.0
+            if has_app_context():
+                timeout = current_app.config['AI_EVALUATION_REQUEST_TIMEOUT']
+            _openai_client = OpenAI(api_key=os.environ["OPENAI_API_KEY"], timeout=timeout)
+        return _openai_client
+
+
+def get_ai_breaker():
+    """
+    Returns the process-wide circuit breaker guarding the AI evaluation,
+    configured from the app config on first use.
+    """
+    global _ai_breaker
+    with _ai_lock:
+        if _ai_breaker is None:
+            config = current_app.config
+            _ai_breaker = CircuitBreaker(
+                'ai_evaluation',
+                error_rate=config['AI_BREAKER_ERROR_RATE'],
+                window=config['AI_BREAKER_WINDOW'],
+                min_calls=config['AI_BREAKER_MIN_CALLS'],
+                cooldown=config['AI_BREAKER_COOLDOWN'],
+                trial_timeout=config['AI_BREAKER_TRIAL_TIMEOUT'],
+            )
+        return _ai_breaker
+
+
+def get_ai_executor():
+    """
+    Returns the thread pool that runs AI evaluations so a request can stop
+    waiting on them once its latency budget is spent.
+    """
+    global _ai_executor
+    with _ai_lock:
+        if _ai_executor is None:
+            _ai_executor = ThreadPoolExecutor(
+                max_workers=current_app.config['AI_EVALUATION_WORKERS'],
+                thread_name_prefix='ai-evaluation')
+        return _ai_executor
+
+
+def get_ingest_executor():
+    """
+    Returns the thread pool that ingests new tests when TEST_INGEST_BACKGROUND
+    is set, so create_test responds before the precomputation is done.
+    """
+    global _ingest_executor
+    with _ai_lock:
+        if _ingest_executor is None:
+            _ingest_executor = ThreadPoolExecutor(
+                max_workers=current_app.config['TEST_INGEST_WORKERS'],
+                thread_name_prefix='test-ingest')
+        return _ingest_executor
+
+
+def get_import_executor():
+    """
+    Returns the single thread that runs archive imports uploaded to POST
+    /import_tests, one at a time so that two imports never race on test names.
+    The process pool doing the work is started by import_tests.
+    """
+    global _import_executor
+    with _ai_lock:
+        if _import_executor is None:
+            _import_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='test-import')
+        return _import_executor
+
+
+def get_submission_buffer():
+    """
+    Returns the process-wide write-behind buffer that batches UserTranscript
+    inserts (with their error outcomes) when WRITE_BEHIND_ENABLED is set.
+    """
+    global _submission_buffer
+    with _ai_lock:
+        if _submission_buffer is None:
+            config = current_app.config
+            _submission_buffer = WriteBehindBuffer(
+                current_app._get_current_object(),
+                UserTranscript.__table__,
+                child_table=TranscriptErrorOutcome.__table__,
+                child_key='user_transcript_id',
+                interval=config['WRITE_BEHIND_INTERVAL_MS'] / 1000,
+                max_rows=config['WRITE_BEHIND_MAX_ROWS'],
+                on_insert=record_submission_stats,
+            )
+        return _submission_buffer
+
+
+def record_submission_stats(executor, rows, outcomes):
+    """
+    Folds new UserTranscript rows into their TestingSessionStats and their error
+    outcomes into TestErrorStats, and bumps the analytics data version, in the
+    caller's transaction.
+    """
+    for row in rows:
+        if row.get('testing_id'):
+            TestingSessionStats.record_submission(
+                executor, row['testing_id'], row['user_id'], row.get('overall_score'), row['created_at'])
+    TestErrorStats.record_outcomes(executor, outcomes)
+    # Last, so the single shared counter row stays locked only until the commit
+    DataVersion.bump(executor)
+
+
+class SubmissionPending(Exception):
+    """
+    The write-behind batch holding a submission did not commit within
+    WRITE_BEHIND_ACK_TIMEOUT. It may still commit: `future` resolves to the new
+    id, or fails with the database error.
+    """
+
+    def __init__(self, future):
+        super().__init__('Submission not acknowledged within the write-behind timeout')
+        self.future = future
+
+
+def save_submission(user_result):
+    """
+    Persists a new UserTranscript with its error outcomes and returns its id.
+    The submission's TestingSessionStats and TestErrorStats are updated in the
+    same transaction.
+
+    With WRITE_BEHIND_ENABLED the row joins the next batched insert and this waits
+    for that batch to commit, so the id is only returned for a durable row.
+
+    Raises:
+        SubmissionPending: The batch has not committed in time.
+    """
+    if user_result.created_at is None:
+        user_result.created_at = datetime.now(timezone.utc)
+    if not current_app.config['WRITE_BEHIND_ENABLED']:
+        db.session.add(user_result)
+        record_submission_stats(db.session, [row_values(user_result)],
+                                [row_values(outcome) for outcome in user_result.error_outcomes])
+        db.session.commit()
+        return user_result.id
+
+    future = get_submission_buffer().submit(
+        row_values(user_result), [row_values(outcome) for outcome in user_result.error_outcomes])
+    try:
+        return future.result(timeout=current_app.config['WRITE_BEHIND_ACK_TIMEOUT'])
+    except FutureTimeoutError:
+        raise SubmissionPending(future)
+
+
+def finish_pending_submission(app, sid, submission_id, future, follow_up, abandon):
+    """
+    Done-callback for a submission answered with 202 before its write-behind batch
+    committed. Tells the submitting client the stored id with `submission_saved`
+    (or `submission_failed`) and starts the AI follow-up for the row; `abandon`
+    runs instead when the row was not saved or the follow-up could not start.
+    """
+    socketio = app.extensions['socketio']
+    followed_up = False
+    try:
+        try:
+            user_transcript_id = future.result()
+        except Exception as e:
+            logger.error(f"Pending submission {submission_id} was not saved: {str(e)}")
+            if sid:
+                socketio.emit('submission_failed', {'submission_id': submission_id}, to=sid)
+            return
+        logger.info(f"Pending submission {submission_id} saved as UserTranscript {user_transcript_id}")
+        if sid:
+            socketio.emit('submission_saved', {
+                'submission_id': submission_id,
+                'user_transcript_id': user_transcript_id
+            }, to=sid)
+        follow_up(user_transcript_id)
+        followed_up = True
+    except Exception as e:
+        logger.error(f"Follow-up of pending submission {submission_id} failed: {str(e)}")
+    finally:
+        if not followed_up:
+            abandon()
+
+
+def record_ai_outcome(breaker, ai_response):
+    if ai_response == AI_EVALUATION_ERROR:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+def save_ai_evaluation(user_transcript_id, ai_response):
+    """
+    Persists the AI evaluation HTML fragment on an existing UserTranscript row.
+    """
+    user_result = db.session.get(UserTranscript, user_transcript_id)
+    if not user_result:
+        logger.warning(f"UserTranscript {user_transcript_id} not found, AI evaluation dropped")
+        return
+    user_result.ai_evaluation = ai_response
+    db.session.commit()
+
+
+def backfill_ai_evaluation(app, sid, user_transcript_id, future):
+    """
+    Done-callback for an AI evaluation that overran the request's latency budget.
+    Writes the late result to the UserTranscript row and announces it to the
+    submitting client with `ai_evaluation_complete`.
+    """
+    ai_response = future.result()
+    if ai_response != AI_EVALUATION_ERROR:
+        with app.app_context():
+            save_ai_evaluation(user_transcript_id, ai_response)
+    logger.info(f"Backfilled AI evaluation for UserTranscript {user_transcript_id}")
+
+    if sid:
+        app.extensions['socketio'].emit('ai_evaluation_complete', {
+            'user_transcript_id': user_transcript_id,
+            'aiEvaluation': ai_response
+        }, to=sid)
+
+
+def stream_ai_evaluation(app, socketio, breaker, sid, user_transcript_id, user_transcript, correct_transcript, scoring_function_eval):
+    """
+    Streams the AI evaluation to the submitting client as it is generated.
+
+    Runs as a Socket.IO background task. Each content delta is emitted to `sid`
+    as an `ai_evaluation_chunk` event; once the completion finishes the full HTML
+    fragment is saved on the UserTranscript row and announced with
+    `ai_evaluation_complete`.
+    """
+    chunks = []
+    try:
+        stream = get_openai_client().chat.completions.create(
+            messages=build_evaluation_messages(
+                user_transcript, correct_transcript, scoring_function_eval),
+            stream=True,
+            **AI_EVALUATION_PARAMS
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                chunks.append(delta)
+                socketio.emit('ai_evaluation_chunk', {
+                    'user_transcript_id': user_transcript_id,
+                    'chunk': delta
+                }, to=sid)
+        ai_response = ''.join(chunks)
+    except Exception as e:
+        logger.error(f"Error in streamed AI evaluation: {str(e)}")
+        ai_response = AI_EVALUATION_ERROR
+    record_ai_outcome(breaker, ai_response)
+
+    if ai_response != AI_EVALUATION_ERROR:
+        with app.app_context():
+            save_ai_evaluation(user_transcript_id, ai_response)
+
+    socketio.emit('ai_evaluation_complete', {
+        'user_transcript_id': user_transcript_id,
+        'aiEvaluation': ai_response
+    }, to=sid)
+
+
 def score_transcription(id):
     """
     Scores a user-submitted transcript against a correct transcript from the database.
 
+    The AI evaluation only gets AI_EVALUATION_BUDGET seconds (measured from the start
+    of the request). If it overruns, the response carries only the rule-based result
+    and the AI result is backfilled onto the row later. While the AI circuit breaker
+    is open the AI evaluation is skipped entirely.
+
     Parameters:
         id (int): The identifier for the transcript test to be scored.
 
@@ -109,15 +412,19 @@ def score_transcription(id):
                   On failure, returns a status of 'error' and an error message.
     """
     # logger.info(f"Scoring transcription for id: {id}")
+    started = time.monotonic()
 
     # Get the user submitted transcript from the request
     user_submitted_transcript = request.json.get('transcript')
     data = request.get_json()
 
     testingId = data.get('testingId')
+    # Socket.IO session of the submitting client, used to stream AI feedback
+    sid = data.get('sid')
+    stream_feedback = bool(sid) and current_app.config.get('AI_EVALUATION_STREAMING', False)
 
     # Fetch the test data using the id
-    test_data = TranscriptTest.query.get(id)
+    test_data = TranscriptTest.get_with_transcripts(id)
 
     if not test_data:
         return jsonify({
@@ -129,38 +436,120 @@ def score_transcription(id):
     bad_transcript = test_data.bad_transcript
 
     compare_transcript_result = transcript_compare.compare_transcript_with_errors(
-        good_transcript, bad_transcript, user_submitted_transcript)
-    
-    aiEvaluation_result = aiEvaluation( user_submitted_transcript, good_transcript, compare_transcript_result) 
-    
-    logger.info(f"AI evaluation result: {aiEvaluation_result}")
-
-    userResult = UserTranscript(
-        testing_id=testingId,
-        user_transcript=user_submitted_transcript,
-        score=json.dumps(compare_transcript_result),
-        test_taken=id,
-        user_id=current_user.id,
-        created_at=datetime.now(),
-        updated_at=datetime.now(),
-        overall_score=compare_transcript_result.get('percentage'),
-        summary=compare_transcript_result.get('message'),
-    )
-    db.session.add(userResult)
-    db.session.commit()
+        good_transcript, bad_transcript, user_submitted_transcript, test_data.introduced_errors())
+    # Stored as child rows, not in the score JSON or the response
+    error_outcomes = compare_transcript_result.pop('error_outcomes')
+
+    breaker = get_ai_breaker()
+    ai_future = None
+    aiEvaluation_result = None
+    if not breaker.allow_request():
+        aiEvaluation_status = 'skipped'
+    elif stream_feedback:
+        aiEvaluation_status = 'streaming'
+    else:
+        get_openai_client()  # Build the client here, where the app config is available
+        ai_future = get_ai_executor().submit(
+            aiEvaluation, user_submitted_transcript, good_transcript, dict(compare_transcript_result))
+        budget = current_app.config['AI_EVALUATION_BUDGET'] - (time.monotonic() - started)
+        try:
+            aiEvaluation_result = ai_future.result(timeout=max(budget, 0))
+            aiEvaluation_status = 'complete'
+            record_ai_outcome(breaker, aiEvaluation_result)
+            logger.info(f"AI evaluation result: {aiEvaluation_result}")
+        except FutureTimeoutError:
+            # Over budget counts against the upstream; the result is backfilled later
+            breaker.record_failure()
+            aiEvaluation_status = 'pending'
+            logger.warning(f"AI evaluation exceeded latency budget for test {id}")
+
+    app = current_app._get_current_object()
+
+    def follow_up(user_transcript_id):
+        # AI work that needs the stored row's id
+        if aiEvaluation_status == 'streaming':
+            socketio = app.extensions['socketio']
+            socketio.start_background_task(
+                stream_ai_evaluation,
+                app,
+                socketio,
+                breaker,
+                sid,
+                user_transcript_id,
+                user_submitted_transcript,
+                good_transcript,
+                dict(compare_transcript_result)
+            )
+        elif aiEvaluation_status == 'pending':
+            ai_future.add_done_callback(
+                lambda future: backfill_ai_evaluation(app, sid, user_transcript_id, future))
+
+    def abandon():
+        # The streaming call the breaker granted (possibly its half-open trial) will not be made
+        if aiEvaluation_status == 'streaming':
+            breaker.release()
+
+    # Set once stream_ai_evaluation or finish_pending_submission is in charge of the breaker outcome
+    handed_off = False
+    try:
+        userResult = UserTranscript(
+            testing_id=testingId,
+            score=dict(compare_transcript_result),
+            test_taken=id,
+            user_id=current_user.id,
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+            overall_score=compare_transcript_result.get('percentage'),
+            summary=compare_transcript_result.get('message'),
+            ai_evaluation=aiEvaluation_result if aiEvaluation_result != AI_EVALUATION_ERROR else None,
+            error_outcomes=[
+                TranscriptErrorOutcome(
+                    test_id=id,
+                    error_id=outcome['id'],
+                    error_type=outcome['type'],
+                    fixed=outcome['fixed'])
+                for outcome in error_outcomes
+            ],
+        )
+        userResult.store_user_transcript(
+            user_submitted_transcript, bad_transcript, current_app.config['TRANSCRIPT_STORAGE_MODE'])
+        if aiEvaluation_status == 'streaming':
+            get_openai_client()
+        try:
+            userResult_id = save_submission(userResult)
+        except SubmissionPending as pending:
+            # The batch may still commit, so a retry could store the submission twice.
+            # The client gets its score now and the id over Socket.IO once it is durable
+            logger.warning(f"Submission for test {id} was not acknowledged within the write-behind timeout")
+            submission_id = uuid.uuid4().hex
+            pending.future.add_done_callback(
+                lambda future: finish_pending_submission(app, sid, submission_id, future, follow_up, abandon))
+            handed_off = True
+            compare_transcript_result['aiEvaluation'] = aiEvaluation_result
+            compare_transcript_result['aiEvaluationStatus'] = aiEvaluation_status
+            compare_transcript_result['user_transcript_id'] = None
+            compare_transcript_result['submission_id'] = submission_id
+            compare_transcript_result['saveStatus'] = 'pending'
+            return jsonify(compare_transcript_result), 202
+
+        logger.info(
+            f"Compare transcript result: {compare_transcript_result}")
+
+        follow_up(userResult_id)
+        handed_off = True
+    finally:
+        if not handed_off:
+            abandon()
 
-    logger.info(
-        f"Compare transcript result: {compare_transcript_result}")
     compare_transcript_result['aiEvaluation'] = aiEvaluation_result
+    compare_transcript_result['aiEvaluationStatus'] = aiEvaluation_status
+    compare_transcript_result['user_transcript_id'] = userResult_id
     return compare_transcript_result
 
 
 
 SRT_UPLOAD_FOLDER = os.path.abspath('files')  # Or your desired path
-AUDIO_UPLOAD_FOLDER = os.path.abspath('static/audio')  # Or your desired path
-
-if not os.path.exists(SRT_UPLOAD_FOLDER):
-    os.makedirs(SRT_UPLOAD_FOLDER)
+AUDIO_UPLOAD_FOLDER = AUDIO_FOLDER
 
 ALLOWED_EXTENSIONS = {'srt', 'm4a', 'wav', 'mp3', }
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
@@ -202,45 +591,59 @@ def create_test():
     if not audio_files:
         return jsonify({'status': 'error', 'message': 'No audio files part'}), 400
 
-    try:
-        new_test = TranscriptTest(
-            good_transcript=good_transcript,
-            bad_transcript=bad_transcript,
-            name_of_test=name_of_test
-        )
+    if any(f.filename != '' and not allowed_file(f.filename) for f in srt_files):
+        return jsonify({'status': 'error', 'message': 'Invalid SRT file format'}), 400
+    if any(f.filename != '' and not allowed_file(f.filename) for f in audio_files):
+        return jsonify({'status': 'error', 'message': 'Invalid audio file format'}), 400
 
-        db.session.add(new_test)
-        db.session.flush()  # Get the ID
-
-        # Save each SRT file
-        for srt_file in srt_files:
-            if srt_file.filename == '':
-                continue
-            if not allowed_file(srt_file.filename):
-                return jsonify({'status': 'error', 'message': 'Invalid SRT file format'}), 400
-
-            srt_filename = secure_filename(f'{new_test.id}.srt')
-            srt_file_path = os.path.join(SRT_UPLOAD_FOLDER, srt_filename)
-            srt_file.save(srt_file_path)
-            # Assuming you have a way to store multiple SRT file paths in your model
+    # Only the last file of each kind is kept
+    srt_file = next((f for f in reversed(srt_files) if f.filename != ''), None)
+    audio_file = next((f for f in reversed(audio_files) if f.filename != ''), None)
 
-        # Save each audio file
-        for audio_file in audio_files:
-            if audio_file.filename == '':
-                continue
-            if not allowed_file(audio_file.filename):
-                return jsonify({'status': 'error', 'message': 'Invalid audio file format'}), 400
+    new_test = TranscriptTest(
+        good_transcript=good_transcript,
+        bad_transcript=bad_transcript,
+        name_of_test=name_of_test
+    )
+    ingest_later = current_app.config['TEST_INGEST_BACKGROUND']
+    try:
+        srt_content = None
+        if srt_file:
+            srt_content = srt_file.stream.read().decode('utf-8')
+            srt_file.stream.seek(0)
+        if not ingest_later:
+            # Rejects the test before anything is written
+            ingest_test(new_test, srt_content)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
 
-            audio_extension = os.path.splitext(audio_file.filename)[1]
+    # Nothing below needs the connection checked out by the login lookup until the
+    # files are on disk, give it back to the pool while they stream
+    db.session.close()
 
-            audio_filename = secure_filename(f'{new_test.id}{audio_extension}')
-            audio_file_path = os.path.join(AUDIO_UPLOAD_FOLDER, audio_filename)
-            audio_file.save(audio_file_path)
+    # Content-addressed: the same recording uploaded twice is stored once. The
+    # folders are created on first use rather than at import time
+    try:
+        stored_srt = srt_file and store_upload(srt_file.stream, SRT_UPLOAD_FOLDER, '.srt')
+        stored_audio = audio_file and store_upload(
+            audio_file.stream, AUDIO_UPLOAD_FOLDER, os.path.splitext(audio_file.filename)[1])
+    except OSError as e:
+        logger.error(f"Error storing test files: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Could not store the uploaded files'}), 500
 
-            new_test.audio_file_path = f'/audio/{new_test.id}{audio_extension}'
-            new_test.srt_file_path = f'./files/{new_test.id}.srt'
+    try:
+        if stored_srt:
+            new_test.srt_file_path = f'./files/{stored_srt.filename}'
+        if stored_audio:
+            new_test.audio_file_path = f'/audio/{stored_audio.filename}'
 
+        db.session.add(new_test)
+        DataVersion.bump(db.session)
         db.session.commit()
+        random_test_selector.invalidate()
+        if ingest_later:
+            get_ingest_executor().submit(
+                ingest_in_background, current_app._get_current_object(), new_test.id, srt_content)
 
         logger.info(f"New test created: {new_test.id}")
         return jsonify({
@@ -250,6 +653,7 @@ def create_test():
         }), 201
 
     except Exception as e:
+        # Stored files stay, a later upload of the same content reuses them
         db.session.rollback()
         logger.error(f"Error creating test: {str(e)}")
         return jsonify({
@@ -264,25 +668,287 @@ def edit_test(id):
     database with the provided data.
     """
 
-    test = TranscriptTest.query.get(id)
+    test = TranscriptTest.get_with_transcripts(id)
     if not test:
         return jsonify({'status': 'error', 'message': 'Test not found'}), 404
 
     # Get form data
     if request.method == 'PATCH':
         data = request.json
+        bad_transcript = data.get('test_transcript', test.bad_transcript)
+        if bad_transcript != test.bad_transcript:
+            # Deltas are relative to the old bad transcript, store those submissions in full first
+            try:
+                inflate_transcripts(test.id, test.bad_transcript)
+            except ValueError as e:
+                db.session.rollback()
+                logger.error(f"Test {test.id} not updated: {e}")
+                return jsonify({'status': 'error', 'message': f'Stored submissions of this test could not be rebuilt, the test transcript was not changed ({e})'}), 409
+        good_transcript = data.get('score_transcript', test.good_transcript)
+        reingest = good_transcript != test.good_transcript or bad_transcript != test.bad_transcript
+        if reingest:
+            previous_errors = transcript_compare.errors_to_seeded(test.introduced_errors())
         test.name_of_test = data.get('name_of_test', test.name_of_test)
-        test.good_transcript = data.get(
-            'score_transcript', test.good_transcript)
-        test.bad_transcript = data.get('test_transcript', test.bad_transcript)
+        test.good_transcript = good_transcript
+        test.bad_transcript = bad_transcript
         test.benchmark_score = data.get(
             'benchmark_score', test.benchmark_score)
+        if reingest:
+            # The seeded errors and automatic benchmark follow the transcripts; the cues stay
+            try:
+                ingest_test(test, benchmark_score=data.get('benchmark_score'))
+            except ValueError as e:
+                db.session.rollback()
+                return jsonify({'status': 'error', 'message': str(e)}), 400
+            if test.seeded_errors != previous_errors:
+                # The counts are kept per error id, and the ids now name other errors
+                db.session.execute(db.delete(TestErrorStats).where(TestErrorStats.test_id == test.id))
+                logger.info(f"Seeded errors of test {test.id} changed, its error stats start over")
 
         # Save changes
+        DataVersion.bump(db.session)
         db.session.commit()
+        random_test_selector.invalidate()
         return jsonify({'status': 'success', 'message': 'Test updated successfully'}), 200
 
 
+def ingest_test(test, srt_content=None, benchmark_score=None):
+    """
+    Runs the ingest stage (utility.test_ingest) for a test and stores the seeded
+    errors, SRT cues and benchmark score on it, without committing. An explicit
+    `benchmark_score` is kept instead of the automatic one.
+
+    Raises:
+        ValueError: The transcripts or the SRT content do not make a valid test.
+    """
+    result = test_ingest.ingest(test.good_transcript, test.bad_transcript, srt_content)
+    test.seeded_errors = result['seeded_errors']
+    if result['srt_cues'] is not None:
+        test.srt_cues = result['srt_cues']
+    test.benchmark_score = result['benchmark_score'] if benchmark_score is None else benchmark_score
+    test.ingested_at = datetime.now(timezone.utc)
+
+
+def read_srt(test):
+    """The test's SRT content, or None when it has no SRT file"""
+    if not test.srt_file_path:
+        return None
+    with open(test.srt_file_path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+
+def get_srt_cues(test_id):
+    """
+    Caption cues of a test ({'index', 'start', 'end', 'text'}, sorted by start),
+    stored at ingest; parsed from the SRT file for a test never ingested.
+
+    Returns:
+        list or None: The cues, None when the test does not exist.
+
+    Raises:
+        FileNotFoundError: The test was not ingested and its SRT file is missing.
+    """
+    row = db.session.execute(
+        db.select(TranscriptTest.srt_cues, TranscriptTest.srt_file_path).where(TranscriptTest.id == test_id)).first()
+    if row is None:
+        return None
+    if row.srt_cues is not None:
+        return row.srt_cues
+    if not row.srt_file_path:
+        return []
+    with open(row.srt_file_path, 'r', encoding='utf-8') as file:
+        return test_ingest.parse_srt(file.read())
+
+
+def ingest_in_background(app, test_id, srt_content):
+    """Ingest-executor task for a test created with TEST_INGEST_BACKGROUND set"""
+    with app.app_context():
+        try:
+            test = TranscriptTest.get_with_transcripts(test_id)
+            if test is None:
+                return
+            ingest_test(test, srt_content)
+            DataVersion.bump(db.session)
+            db.session.commit()
+            logger.info(f"Ingested test {test_id}")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error ingesting test {test_id}: {str(e)}")
+
+
+def ingest_tests(reingest=False):
+    """
+    Ingests the tests created before the ingest stage existed, or every test with
+    `reingest`. Each test is committed on its own, one that fails validation is
+    logged and left as it was.
+
+    Returns:
+        tuple: (ingested, failed) test counts.
+    """
+    query = db.select(TranscriptTest.id).order_by(TranscriptTest.id)
+    if not reingest:
+        query = query.where(TranscriptTest.ingested_at.is_(None))
+    ingested = failed = 0
+    for test_id in db.session.scalars(query).all():
+        test = TranscriptTest.get_with_transcripts(test_id)
+        try:
+            try:
+                srt_content = read_srt(test)
+            except FileNotFoundError:
+                logger.warning(f"SRT file {test.srt_file_path} of test {test_id} not found, ingesting without cues")
+                srt_content = None
+            # A benchmark set through edit_test is kept
+            ingest_test(test, srt_content, benchmark_score=test.benchmark_score)
+        except ValueError as e:
+            db.session.rollback()
+            logger.error(f"Test {test_id} not ingested: {str(e)}")
+            failed += 1
+            continue
+        DataVersion.bump(db.session)
+        db.session.commit()
+        ingested += 1
+    return ingested, failed
+
+
+def import_tests(archive_path, workers=None, batch_size=100):
+    """
+    Imports the tests listed in a zip archive's manifest (see utility.test_import).
+
+    Entries are validated, ingested and their files stored by `workers` processes;
+    the resulting rows are inserted `batch_size` per transaction, in manifest
+    order. Invalid entries are reported and skipped, entries whose name is already
+    taken by a test are skipped, so an interrupted import can be run again.
+
+    Returns:
+        dict: imported (new test ids), skipped (names) and failed
+              ({position, name, error}) entries.
+
+    Raises:
+        ValueError: The archive is not a zip file or has no valid manifest.
+    """
+    entries = test_import.read_manifest(archive_path)
+    existing = set(db.session.scalars(db.select(TranscriptTest.name_of_test)))
+    imported, skipped, failed = [], [], []
+    rows = []
+
+    # Spawned rather than forked: a fork would copy this process's threads and pooled connections
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=test_import.open_archive, initargs=(archive_path,)) as executor:
+        futures = []
+        for entry in entries:
+            name = test_import.entry_name(entry)
+            if name in existing:
+                skipped.append(name)
+                futures.append(None)
+                continue
+            # An entry without a usable name fails validation in prepare_test, it is not a duplicate
+            if name is not None:
+                existing.add(name)
+            futures.append(executor.submit(
+                test_import.prepare_test, entry, SRT_UPLOAD_FOLDER, AUDIO_UPLOAD_FOLDER, ALLOWED_EXTENSIONS - {'srt'}))
+
+        for position, (entry, future) in enumerate(zip(entries, futures)):
+            if future is None:
+                continue
+            try:
+                rows.append(future.result())
+            except Exception as e:
+                # Whatever one entry raises (a corrupt member, a malformed field) fails that entry only
+                failed.append({
+                    'position': position,
+                    'name': test_import.entry_name(entry),
+                    'error': str(e) or type(e).__name__,
+                })
+            if len(rows) >= batch_size:
+                imported.extend(_insert_tests(rows))
+                rows = []
+        imported.extend(_insert_tests(rows))
+
+    if imported:
+        random_test_selector.invalidate()
+    logger.info(f"Imported {len(imported)} tests, skipped {len(skipped)}, {len(failed)} failed")
+    return {'imported': imported, 'skipped': skipped, 'failed': failed}
+
+
+def _insert_tests(rows):
+    if not rows:
+        return []
+    ids = db.session.scalars(db.insert(TranscriptTest).returning(TranscriptTest.id, sort_by_parameter_order=True), rows).all()
+    DataVersion.bump(db.session)
+    db.session.commit()
+    return ids
+
+
+def import_tests_upload():
+    """
+    Starts importing the zip archive uploaded as `archive` (see import_tests) on the
+    import executor and responds with the job to poll at GET /import_tests/<job_id>.
+    Large libraries are better imported with `flask transcription import-tests`,
+    which has no upload size limit.
+    """
+    archive = request.files.get('archive')
+    if not archive or not archive.filename.lower().endswith('.zip'):
+        return jsonify({'status': 'error', 'message': 'Upload a .zip archive as "archive"'}), 400
+
+    fd, archive_path = tempfile.mkstemp(suffix='.zip')
+    queued = False
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            shutil.copyfileobj(archive.stream, file, CHUNK_SIZE)
+        # Rejected here rather than in a job nobody may look at
+        test_import.read_manifest(archive_path)
+
+        job = TestImportJob(id=uuid.uuid4().hex, status=TestImportJob.PENDING,
+                             requested_by=current_user.id if current_user.is_authenticated else None)
+        db.session.add(job)
+        db.session.commit()
+        # The job removes the archive once it is done
+        get_import_executor().submit(run_import_job, current_app._get_current_object(), job.id, archive_path)
+        queued = True
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    finally:
+        if not queued:
+            os.unlink(archive_path)
+
+    logger.info(f"Queued test import job {job.id}")
+    return jsonify({'status': 'success', 'job': job.serialize()}), 202
+
+
+def run_import_job(app, job_id, archive_path):
+    """Import-executor task for an archive uploaded to POST /import_tests, removes the archive when done"""
+    with app.app_context():
+        try:
+            job = db.session.get(TestImportJob, job_id)
+            job.status = TestImportJob.RUNNING
+            db.session.commit()
+            try:
+                result = import_tests(archive_path, app.config['TEST_IMPORT_WORKERS'], app.config['TEST_IMPORT_BATCH_SIZE'])
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Test import job {job_id} failed: {str(e)}")
+                job = db.session.get(TestImportJob, job_id)
+                job.status, job.error = TestImportJob.FAILED, str(e)
+            else:
+                job = db.session.get(TestImportJob, job_id)
+                job.status, job.result = TestImportJob.DONE, result
+            job.finished_at = datetime.now(timezone.utc)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Could not record test import job {job_id}: {str(e)}")
+        finally:
+            os.unlink(archive_path)
+
+
+def get_import_job(job_id):
+    """Status of a test import job, with import_tests's result once it is done"""
+    job = db.session.get(TestImportJob, job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Import job not found'}), 404
+    return jsonify({'status': 'success', 'job': job.serialize()})
+
+
 def get_single_test(id):
     """
     Retrieves a single transcription test from the database based on its ID.
@@ -290,7 +956,7 @@ def get_single_test(id):
     Response: A JSON response containing the status and the test details.
     """
     logger.info(f"Getting test with ID: {id}")
-    test = TranscriptTest.query.get(id)
+    test = TranscriptTest.get_with_transcripts(id)
     if not test:
         return jsonify({'status': 'error', 'message': 'Test not found'}), 404
     return jsonify({
@@ -299,6 +965,7 @@ def get_single_test(id):
     })
 
 
+@replica_reads
 def get_tests():
     """
     Retrieves all transcription tests from the database.
@@ -306,21 +973,210 @@ def get_tests():
     Response: A JSON response containing the status and a list of test details.
     """
     logger.info("Getting all transcription tests")
-    tests = TranscriptTest.query.all()
+    tests = TranscriptTest.summaries()
     return render_template('tests.html', tests=tests)
 
 
+@replica_reads
 def take_tests():
     testing_id = datetime.now().strftime("%Y%m%d%H%M%S")
-    tests = TranscriptTest.query.all()
-    tests_data = []
-    for test in tests:
-        tests_data.append({
-            'id': test.id,
-            'name_of_test': test.name_of_test,
-            'good_transcript': test.good_transcript,
-            'bad_transcript': test.bad_transcript,
-            'audio_file_path': test.audio_file_path,
-            'srt_file_path': test.srt_file_path
-        })
+    # The test page only needs ids, names and media paths; transcripts stay in the database
+    tests_data = TranscriptTest.summaries()
+    for test in tests_data:
+        test['audio_url'] = audio_url(test['audio_file_path'])
     return render_template('take_test.html', tests=tests_data, testing_id=testing_id)
+
+
+def backfill_error_outcomes(batch_size=500):
+    """
+    Creates TranscriptErrorOutcome rows for submissions scored before per-error
+    outcomes were stored, and folds them into TestErrorStats in the same
+    transaction. The seeded errors are regenerated once per test and matched
+    against the missed errors recorded in each stored score.
+
+    Returns:
+        int: The number of submissions that were backfilled.
+    """
+    has_outcomes = db.select(TranscriptErrorOutcome.id).where(
+        TranscriptErrorOutcome.user_transcript_id == UserTranscript.id).exists()
+    seeded_errors = {}
+    backfilled = 0
+    last_id = 0
+
+    while True:
+        rows = db.session.execute(
+            db.select(UserTranscript.id, UserTranscript.test_taken, UserTranscript.score)
+            .where(UserTranscript.id > last_id, ~has_outcomes)
+            .order_by(UserTranscript.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        outcomes = []
+        for row in rows:
+            if row.test_taken not in seeded_errors:
+                test = TranscriptTest.get_with_transcripts(row.test_taken)
+                seeded_errors[row.test_taken] = test.introduced_errors() if test else []
+            missed = {error['id'] for error in (row.score or {}).get('error_tracking', {}).get('missed_errors', [])}
+            outcomes.extend({
+                'user_transcript_id': row.id,
+                'test_id': row.test_taken,
+                'error_id': error.error_id,
+                'error_type': error.error_type,
+                'fixed': error.error_id not in missed
+            } for error in seeded_errors[row.test_taken])
+
+        if outcomes:
+            db.session.execute(db.insert(TranscriptErrorOutcome), outcomes)
+            TestErrorStats.record_outcomes(db.session, outcomes)
+            DataVersion.bump(db.session)
+        db.session.commit()
+        last_id = rows[-1].id
+        backfilled += len(rows)
+        logger.info(f"Backfilled error outcomes up to UserTranscript {last_id}")
+
+    return backfilled
+
+
+def compact_transcripts(batch_size=500):
+    """
+    Converts submissions stored in full into edit scripts against their test's
+    bad transcript. Each script is verified by rebuilding the text before the row
+    is rewritten; rows whose script would not be smaller are left as they are.
+
+    Returns:
+        tuple: (rows compacted, rows examined)
+    """
+    table = UserTranscript.__table__
+    bad_transcripts = {}
+    compacted = examined = 0
+    last_id = 0
+
+    while True:
+        rows = db.session.execute(
+            db.select(table.c.id, table.c.test_taken, table.c.user_transcript)
+            .where(table.c.id > last_id, table.c.transcript_delta.is_(None),
+                   table.c.user_transcript.isnot(None))
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        updates = []
+        for row in rows:
+            if row.test_taken not in bad_transcripts:
+                test = TranscriptTest.get_with_transcripts(row.test_taken)
+                bad_transcripts[row.test_taken] = test.bad_transcript if test else None
+            bad_transcript = bad_transcripts[row.test_taken]
+            if bad_transcript is None:
+                continue
+            script = transcript_delta.encode_delta(bad_transcript, row.user_transcript)
+            if len(json.dumps(script)) >= len(row.user_transcript):
+                continue
+            if transcript_delta.apply_delta(bad_transcript, script) != row.user_transcript:
+                logger.error(f"Delta round trip failed for UserTranscript {row.id}, keeping full text")
+                continue
+            updates.append({
+                'b_id': row.id,
+                'b_delta': script,
+                'b_checksum': transcript_delta.checksum(row.user_transcript)
+            })
+
+        if updates:
+            db.session.execute(
+                table.update().where(table.c.id == db.bindparam('b_id')).values(
+                    user_transcript=None,
+                    transcript_delta=db.bindparam('b_delta'),
+                    transcript_checksum=db.bindparam('b_checksum')),
+                updates)
+        db.session.commit()
+        last_id = rows[-1].id
+        compacted += len(updates)
+        examined += len(rows)
+        logger.info(f"Compacted {compacted} of {examined} transcripts")
+
+    return compacted, examined
+
+
+def inflate_transcripts(test_id, bad_transcript):
+    """
+    Rewrites every delta-encoded submission of a test, live or archived, back to
+    its full text. Must run before the test's bad transcript changes. Runs in the
+    caller's transaction.
+
+    Raises:
+        ValueError: A delta does not rebuild the submission it was stored for;
+        the caller must roll back the updates already made.
+    """
+    inflated = 0
+    for table in (UserTranscript.__table__, UserTranscriptArchive.__table__):
+        rows = db.session.execute(
+            db.select(table.c.id, table.c.transcript_delta, table.c.transcript_checksum)
+            .where(table.c.test_taken == test_id, table.c.transcript_delta.isnot(None))
+        ).all()
+        updates = []
+        for row in rows:
+            text = transcript_delta.apply_delta(bad_transcript, row.transcript_delta)
+            if transcript_delta.checksum(text) != row.transcript_checksum:
+                raise ValueError(f'Checksum mismatch rebuilding {table.name} {row.id}')
+            updates.append({'b_id': row.id, 'b_text': text})
+        if updates:
+            db.session.execute(
+                table.update().where(table.c.id == db.bindparam('b_id')).values(
+                    user_transcript=db.bindparam('b_text'), transcript_delta=None),
+                updates)
+        inflated += len(updates)
+    logger.info(f"Inflated {inflated} transcripts of test {test_id}")
+
+
+def archive_submissions(cutoff, batch_size=500):
+    """
+    Moves submissions created before `cutoff` from user_transcript into
+    user_transcript_archive, oldest first, one transaction per batch. Their error
+    outcomes are inlined on the archive row and folded, with the scores, into the
+    per-user, per-test UserTestRollup rows.
+
+    Returns:
+        int: The number of submissions archived.
+    """
+    live = UserTranscript.__table__
+    outcomes = TranscriptErrorOutcome.__table__
+    archived = 0
+
+    while True:
+        rows = db.session.execute(
+            db.select(live).where(live.c.created_at < cutoff).order_by(live.c.id).limit(batch_size)
+        ).mappings().all()
+        if not rows:
+            break
+        ids = [row['id'] for row in rows]
+
+        outcomes_by_id = {id: [] for id in ids}
+        for outcome in db.session.execute(
+                db.select(outcomes.c.user_transcript_id, outcomes.c.error_id,
+                          outcomes.c.error_type, outcomes.c.fixed)
+                .where(outcomes.c.user_transcript_id.in_(ids))
+                .order_by(outcomes.c.id)):
+            outcomes_by_id[outcome.user_transcript_id].append(
+                {'id': outcome.error_id, 'type': outcome.error_type, 'fixed': outcome.fixed})
+
+        archived_at = datetime.now()
+        db.session.execute(db.insert(UserTranscriptArchive.__table__), [
+            dict(row, error_outcomes=outcomes_by_id[row['id']], archived_at=archived_at)
+            for row in rows
+        ])
+        for row in rows:
+            UserTestRollup.get_or_create(row['user_id'], row['test_taken']).add_submission(
+                row['overall_score'], row['created_at'], outcomes_by_id[row['id']])
+        db.session.flush()
+
+        db.session.execute(db.delete(outcomes).where(outcomes.c.user_transcript_id.in_(ids)))
+        db.session.execute(db.delete(live).where(live.c.id.in_(ids)))
+        DataVersion.bump(db.session)
+        db.session.commit()
+        archived += len(rows)
+        logger.info(f"Archived {archived} submissions created before {cutoff}")
+
+    return archived
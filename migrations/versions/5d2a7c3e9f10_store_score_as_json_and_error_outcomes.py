@@ -0,0 +1,113 @@
+"""store UserTranscript.score as JSON and add transcript_error_outcome
+
+Revision ID: 5d2a7c3e9f10
+Revises: 8b4e6f0c1d25
+Create Date: 2026-10-19 14:03:52.661270
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2a7c3e9f10'
+down_revision = '8b4e6f0c1d25'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 1000
+
+
+def json_type():
+    return sa.JSON().with_variant(postgresql.JSONB(), 'postgresql')
+
+
+def _parse_score(raw):
+    try:
+        return json.loads(raw) if raw else {}
+    except ValueError:
+        # Scores truncated by the old String(15000) column are kept verbatim
+        return {'legacy_score': raw}
+
+
+def _copy_in_batches(source, target, convert, only_missing=False):
+    """Copy the `source` (name, type) column into `target` on user_transcript in id-ordered batches"""
+    connection = op.get_bind()
+    source, target = sa.column(*source), sa.column(*target)
+    table = sa.table('user_transcript', sa.column('id', sa.Integer), source, target)
+    update = table.update().where(table.c.id == sa.bindparam('b_id')).values(
+        {target.name: sa.bindparam('b_value')})
+    last_id = 0
+    while True:
+        query = sa.select(table.c.id, source).where(table.c.id > last_id)
+        if only_missing:
+            query = query.where(target.is_(None))
+        rows = connection.execute(query.order_by(table.c.id).limit(BATCH_SIZE)).all()
+        if not rows:
+            return
+        connection.execute(update, [{'b_id': row[0], 'b_value': convert(row[1])} for row in rows])
+        last_id = rows[-1][0]
+
+
+def _online_copy(source, target, convert):
+    if op.get_bind().dialect.name == 'postgresql':
+        # Commit every batch so the backfill never holds long locks on live rows
+        with op.get_context().autocommit_block():
+            _copy_in_batches(source, target, convert)
+    else:
+        _copy_in_batches(source, target, convert)
+    # Catch up on rows written by the previous release while the backfill ran
+    _copy_in_batches(source, target, convert, only_missing=True)
+
+
+def upgrade():
+    with op.batch_alter_table('user_transcript', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('score_json', json_type(), nullable=True))
+
+    op.create_table('transcript_error_outcome',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_transcript_id', sa.Integer(), nullable=False),
+    sa.Column('test_id', sa.Integer(), nullable=False),
+    sa.Column('error_id', sa.String(length=20), nullable=False),
+    sa.Column('error_type', sa.String(length=20), nullable=True),
+    sa.Column('fixed', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['test_id'], ['transcript_test.id'], ),
+    sa.ForeignKeyConstraint(['user_transcript_id'], ['user_transcript.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('transcript_error_outcome', schema=None) as batch_op:
+        batch_op.create_index('ix_transcript_error_outcome_test_id_error_id', ['test_id', 'error_id', 'fixed'], unique=False)
+        batch_op.create_index(batch_op.f('ix_transcript_error_outcome_user_transcript_id'), ['user_transcript_id'], unique=False)
+
+    _online_copy(('score', sa.String()), ('score_json', json_type()), _parse_score)
+
+    with op.batch_alter_table('user_transcript', schema=None) as batch_op:
+        batch_op.drop_column('score')
+        batch_op.alter_column('score_json', new_column_name='score',
+               existing_type=json_type(),
+               nullable=False)
+
+    # Per-error outcomes of existing submissions: flask transcription backfill-error-outcomes
+
+
+def downgrade():
+    with op.batch_alter_table('user_transcript', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('score_text', sa.String(length=15000), nullable=True))
+
+    _online_copy(('score', json_type()), ('score_text', sa.String()), json.dumps)
+
+    with op.batch_alter_table('user_transcript', schema=None) as batch_op:
+        batch_op.drop_column('score')
+        batch_op.alter_column('score_text', new_column_name='score',
+               existing_type=sa.String(length=15000),
+               nullable=False)
+
+    with op.batch_alter_table('transcript_error_outcome', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_transcript_error_outcome_user_transcript_id'))
+        batch_op.drop_index('ix_transcript_error_outcome_test_id_error_id')
+
+    op.drop_table('transcript_error_outcome')
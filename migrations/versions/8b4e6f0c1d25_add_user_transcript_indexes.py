@@ -0,0 +1,41 @@
+"""add indexes for UserTranscript access patterns
+
+Revision ID: 8b4e6f0c1d25
+Revises: 3f1c2a9d8e47
+Create Date: 2026-10-19 11:40:07.218934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e6f0c1d25'
+down_revision = '3f1c2a9d8e47'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_user_transcript_user_id_created_at', ['user_id', 'created_at']),
+    ('ix_user_transcript_testing_id_overall_score', ['testing_id', 'overall_score']),
+    ('ix_user_transcript_test_taken_created_at', ['test_taken', 'created_at']),
+    ('ix_user_transcript_overall_score', ['overall_score']),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # Build concurrently so submissions keep flowing while the indexes are created
+        with op.get_context().autocommit_block():
+            for name, columns in INDEXES:
+                op.create_index(name, 'user_transcript', columns, unique=False,
+                                postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, columns in INDEXES:
+            op.create_index(name, 'user_transcript', columns, unique=False)
+
+
+def downgrade():
+    for name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name='user_transcript')
@@ -1,3 +1,3 @@
 from config.extensions import db
 from models.user import User
-from models.transcript import TranscriptTest, UserTranscript
\ No newline at end of file
+from models.transcript import TranscriptTest, UserTranscript, TranscriptErrorOutcome, UserTranscriptArchive, UserTestRollup, TestingSessionStats, TestErrorStats, ActivityBucket, DataVersion, TestImportJob
\ No newline at end of file
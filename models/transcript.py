@@ -1,13 +1,23 @@
+import json
 from config.extensions import db
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.dialects.postgresql import JSONB
+from utility import transcript_compare, transcript_delta
+from utility.upsert import upsert
+
+# JSONB on PostgreSQL (indexable, queryable), plain JSON elsewhere (e.g. SQLite).
+# None is stored as SQL NULL, not JSON null, so IS NULL filters see it from Core inserts too
+JSONType = db.JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql')
 
 
 class TranscriptTest(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    good_transcript = db.Column(
-        db.String(15000), nullable=False)  # Used to score test
-    bad_transcript = db.Column(
-        db.String(15000), nullable=False)  # Used to generate test
+    # Transcripts are up to 15,000 characters each, so they are only loaded on access
+    # or through `get_with_transcripts`; listings use `summaries` instead
+    good_transcript = db.deferred(db.Column(
+        db.String(15000), nullable=False), group='transcripts')  # Used to score test
+    bad_transcript = db.deferred(db.Column(
+        db.String(15000), nullable=False), group='transcripts')  # Used to generate test
     # Path to audio file for test
     audio_file_path = db.Column(db.String(200), nullable=True)
     # Path to srt file for test
@@ -16,10 +26,38 @@ class TranscriptTest(db.Model):
         db.String(150), nullable=False)  # Name of the test
     # score before any changes made to the transcript
     benchmark_score = db.Column(db.Float, nullable=True)
+    # Ingest results (utility.test_ingest), NULL until the test is ingested. The seeded
+    # errors are needed to score every submission, so they load with the transcripts
+    seeded_errors = db.deferred(db.Column(JSONType, nullable=True), group='transcripts')
+    srt_cues = db.deferred(db.Column(JSONType, nullable=True))
+    ingested_at = db.Column(db.DateTime, nullable=True)
 
     def __repr__(self):
         return f'<TranscriptTest {self.id}>'
 
+    @classmethod
+    def get_with_transcripts(cls, id):
+        """Load a single test with both transcripts in one query"""
+        return db.session.get(cls, id, options=[db.undefer_group('transcripts')])
+
+    @classmethod
+    def summaries(cls):
+        """List every test without its transcripts, as plain dicts"""
+        rows = db.session.execute(db.select(
+            cls.id,
+            cls.name_of_test,
+            cls.audio_file_path,
+            cls.srt_file_path,
+            cls.benchmark_score
+        ).order_by(cls.id)).mappings()
+        return [dict(row) for row in rows]
+
+    def introduced_errors(self):
+        """Seeded errors to score against, from the ingest results when the test has them"""
+        if self.seeded_errors is not None:
+            return transcript_compare.errors_from_seeded(self.seeded_errors)
+        return transcript_compare.generate_introduced_errors(self.good_transcript, self.bad_transcript)
+
     def serialize(self):
         return {
             'id': self.id,
@@ -33,20 +71,383 @@ class TranscriptTest(db.Model):
 
 
 class UserTranscript(db.Model):
+    __table_args__ = (
+        # Per-user history, newest first
+        db.Index('ix_user_transcript_user_id_created_at', 'user_id', 'created_at'),
+        # Per-session and practice leaderboards, keyset pages on (overall_score, created_at)
+        db.Index('ix_user_transcript_testing_id_overall_score_created_at', 'testing_id', 'overall_score', 'created_at'),
+        # Per-test history
+        db.Index('ix_user_transcript_test_taken_created_at', 'test_taken', 'created_at'),
+        # Global leaderboard ordering
+        db.Index('ix_user_transcript_overall_score', 'overall_score'),
+        # Activity buckets refresh from the open hour onwards
+        db.Index('ix_user_transcript_created_at', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    # Stores test scores in JSON format
-    score = db.Column(db.String(15000), nullable=False)
+    # Result of compare_transcript_with_errors
+    score = db.Column(JSONType, nullable=False)
     test_taken = db.Column(db.Integer, db.ForeignKey(
         'transcript_test.id'), nullable=False)
-    # User's submitted transcript
-    user_transcript = db.Column(db.String(15000), nullable=False)
+    # User's submitted transcript, NULL when it is stored as a delta (use `user_transcript`)
+    _user_transcript = db.Column('user_transcript', db.String(15000), nullable=True)
+    # Edit script against the test's bad transcript, see utility.transcript_delta
+    transcript_delta = db.Column(JSONType, nullable=True)
+    # SHA-256 of the full submitted transcript
+    transcript_checksum = db.Column(db.String(64), nullable=True)
     testing_id = db.Column(db.String(25), nullable=True)
     # Overall score of the transcript
     overall_score = db.Column(db.Float, nullable=True)
     # Summary of the transcript
     summary = db.Column(db.String(15000), nullable=True)
+    # HTML fragment returned by the AI evaluation
+    ai_evaluation = db.Column(db.String(15000), nullable=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(
         timezone.utc))  # Auto-set on creation
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(
         timezone.utc), onupdate=datetime.now())  # Auto-set on update
+
+    # Outcome of every seeded error for this submission
+    error_outcomes = db.relationship('TranscriptErrorOutcome', backref='user_transcript', lazy=True)
+    test = db.relationship('TranscriptTest', lazy=True)
+
+    @property
+    def user_transcript(self):
+        """The submitted transcript, rebuilt from the delta when stored compactly"""
+        if self.transcript_delta is None:
+            return self._user_transcript
+        text = transcript_delta.apply_delta(self.test.bad_transcript, self.transcript_delta)
+        if transcript_delta.checksum(text) != self.transcript_checksum:
+            raise ValueError(f'Checksum mismatch rebuilding UserTranscript {self.id}')
+        return text
+
+    @user_transcript.setter
+    def user_transcript(self, text):
+        self._user_transcript = text
+        self.transcript_delta = None
+        self.transcript_checksum = transcript_delta.checksum(text)
+
+    def store_user_transcript(self, text, bad_transcript, mode='delta'):
+        """
+        Store the submitted transcript in full, or as an edit script against the
+        test's bad transcript when mode is 'delta' and the script is smaller.
+        """
+        self.user_transcript = text
+        if mode != 'delta':
+            return
+        script = transcript_delta.encode_delta(bad_transcript, text)
+        if len(json.dumps(script)) < len(text):
+            self._user_transcript = None
+            self.transcript_delta = script
+
+
+class UserTranscriptArchive(db.Model):
+    """
+    UserTranscript rows moved out of the live table by
+    `flask transcription archive-submissions`, with their error outcomes inlined.
+    Ids are kept from the live table.
+    """
+    __table_args__ = (
+        db.Index('ix_user_transcript_archive_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_user_transcript_archive_test_taken_created_at', 'test_taken', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    score = db.Column(JSONType, nullable=False)
+    test_taken = db.Column(db.Integer, db.ForeignKey(
+        'transcript_test.id'), nullable=False)
+    user_transcript = db.Column(db.String(15000), nullable=True)
+    transcript_delta = db.Column(JSONType, nullable=True)
+    transcript_checksum = db.Column(db.String(64), nullable=True)
+    testing_id = db.Column(db.String(25), nullable=True)
+    overall_score = db.Column(db.Float, nullable=True)
+    summary = db.Column(db.String(15000), nullable=True)
+    ai_evaluation = db.Column(db.String(15000), nullable=True)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    # [{"id", "type", "fixed"}] from TranscriptErrorOutcome
+    error_outcomes = db.Column(JSONType, nullable=True)
+    archived_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+class UserTestRollup(db.Model):
+    """
+    Per-user, per-test aggregates of archived submissions. All-time figures are
+    these plus the same aggregates over the live user_transcript rows.
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    test_id = db.Column(db.Integer, db.ForeignKey('transcript_test.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # Attempts with an overall_score, score_sum / scored_attempts is the average
+    scored_attempts = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0.0)
+    best_score = db.Column(db.Float, nullable=True)
+    errors_total = db.Column(db.Integer, nullable=False, default=0)
+    errors_fixed = db.Column(db.Integer, nullable=False, default=0)
+    first_taken_at = db.Column(db.DateTime, nullable=True)
+    last_taken_at = db.Column(db.DateTime, nullable=True)
+
+    @classmethod
+    def get_or_create(cls, user_id, test_id):
+        rollup = db.session.get(cls, (user_id, test_id))
+        if rollup is None:
+            rollup = cls(user_id=user_id, test_id=test_id, attempts=0, scored_attempts=0,
+                         score_sum=0.0, errors_total=0, errors_fixed=0)
+            db.session.add(rollup)
+        return rollup
+
+    def add_submission(self, overall_score, created_at, error_outcomes):
+        """Fold one submission (and its error outcomes) into the aggregates"""
+        self.attempts += 1
+        if overall_score is not None:
+            self.scored_attempts += 1
+            self.score_sum += overall_score
+            if self.best_score is None or overall_score > self.best_score:
+                self.best_score = overall_score
+        self.errors_total += len(error_outcomes)
+        self.errors_fixed += sum(1 for outcome in error_outcomes if outcome['fixed'])
+        if created_at is not None:
+            if self.first_taken_at is None or created_at < self.first_taken_at:
+                self.first_taken_at = created_at
+            if self.last_taken_at is None or created_at > self.last_taken_at:
+                self.last_taken_at = created_at
+
+
+class TestingSessionStats(db.Model):
+    """
+    Running aggregates of the submissions sharing a testing_id (an assessment),
+    updated with every submission, for the stats leaderboard. Archiving
+    submissions leaves them in place, `flask analytics rebuild-session-stats`
+    recomputes them from the live and archived submissions.
+    """
+    __tablename__ = 'testing_session_stats'
+    __table_args__ = (
+        # Leaderboard ordering, newest first among equal scores
+        db.Index('ix_testing_session_stats_average_score_top_created_at', 'average_score', 'top_created_at'),
+    )
+
+    testing_id = db.Column(db.String(25), primary_key=True)
+    submissions = db.Column(db.Integer, nullable=False)
+    # Sum of overall_score, submissions without one count as 0
+    score_sum = db.Column(db.Float, nullable=False)
+    # score_sum / submissions, stored so the leaderboard can read it off an index
+    average_score = db.Column(db.Float, nullable=False)
+    max_score = db.Column(db.Float, nullable=True)
+    # Top scorer, first submission wins ties
+    top_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    top_created_at = db.Column(db.DateTime, nullable=True)
+    first_submitted_at = db.Column(db.DateTime, nullable=True)
+    last_submitted_at = db.Column(db.DateTime, nullable=True)
+
+    @classmethod
+    def record_submission(cls, executor, testing_id, user_id, overall_score, created_at):
+        """
+        Fold one submission into its session's row with a single upsert, run on
+        `executor` (a Session or Connection) so it commits with the submission.
+        """
+        score = overall_score or 0.0
+
+        def update(table, new):
+            submissions = table.c.submissions + 1
+            score_sum = table.c.score_sum + new.score_sum
+            takes_top = db.and_(new.max_score.isnot(None),
+                                db.or_(table.c.max_score.is_(None), new.max_score > table.c.max_score))
+            return {
+                'submissions': submissions,
+                'score_sum': score_sum,
+                'average_score': score_sum / submissions,
+                'max_score': db.case((takes_top, new.max_score), else_=table.c.max_score),
+                'top_user_id': db.case((takes_top, new.top_user_id), else_=table.c.top_user_id),
+                'top_created_at': db.case((takes_top, new.top_created_at), else_=table.c.top_created_at),
+                # Concurrent submissions can commit out of created_at order
+                'first_submitted_at': db.case(
+                    (table.c.first_submitted_at.is_(None), new.first_submitted_at),
+                    (new.first_submitted_at < table.c.first_submitted_at, new.first_submitted_at),
+                    else_=table.c.first_submitted_at),
+                'last_submitted_at': db.case(
+                    (table.c.last_submitted_at.is_(None), new.last_submitted_at),
+                    (new.last_submitted_at > table.c.last_submitted_at, new.last_submitted_at),
+                    else_=table.c.last_submitted_at),
+            }
+
+        upsert(executor, cls.__table__, {
+            'testing_id': testing_id,
+            'submissions': 1,
+            'score_sum': score,
+            'average_score': score,
+            'max_score': overall_score,
+            'top_user_id': user_id,
+            'top_created_at': created_at,
+            'first_submitted_at': created_at,
+            'last_submitted_at': created_at,
+        }, ['testing_id'], update)
+
+
+class TestErrorStats(db.Model):
+    """
+    How often each seeded error of a test was missed, over all submissions,
+    updated with every submission. `flask analytics rebuild-error-stats`
+    recomputes it from the live and archived error outcomes.
+    """
+    __tablename__ = 'test_error_stats'
+
+    test_id = db.Column(db.Integer, db.ForeignKey('transcript_test.id'), primary_key=True)
+    error_id = db.Column(db.String(20), primary_key=True)  # e.g. "E3"
+    # replace / delete / insert, NULL when unknown for backfilled rows
+    error_type = db.Column(db.String(20), nullable=True)
+    # Submissions the error was scored in, and those that left it in
+    attempts = db.Column(db.Integer, nullable=False)
+    missed = db.Column(db.Integer, nullable=False)
+
+    @classmethod
+    def record_outcomes(cls, executor, outcomes):
+        """
+        Fold error outcomes ({"test_id", "error_id", "error_type", "fixed"}) into
+        the counts with one upsert, run on `executor` (a Session or Connection)
+        so it commits with the submissions.
+        """
+        counts = {}
+        for outcome in outcomes:
+            row = counts.setdefault((outcome['test_id'], outcome['error_id']), {
+                'test_id': outcome['test_id'],
+                'error_id': outcome['error_id'],
+                'error_type': outcome.get('error_type'),
+                'attempts': 0,
+                'missed': 0,
+            })
+            row['attempts'] += 1
+            row['missed'] += 0 if outcome['fixed'] else 1
+        if not counts:
+            return
+
+        def update(table, new):
+            return {
+                'error_type': db.func.coalesce(new.error_type, table.c.error_type),
+                'attempts': table.c.attempts + new.attempts,
+                'missed': table.c.missed + new.missed,
+            }
+
+        upsert(executor, cls.__table__, [counts[key] for key in sorted(counts)], ['test_id', 'error_id'], update)
+
+
+class ActivityBucket(db.Model):
+    """
+    Submission counts and score totals per hour, day and week, materialized from
+    user_transcript by `analyticsController.refresh_activity`. Hour buckets are
+    aggregated from the submissions, day and week buckets from the hour buckets.
+    Archiving submissions leaves them in place.
+    """
+    __tablename__ = 'activity_bucket'
+
+    GRANULARITIES = {
+        'hour': timedelta(hours=1),
+        'day': timedelta(days=1),
+        'week': timedelta(weeks=1),
+    }
+
+    granularity = db.Column(db.String(10), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    submissions = db.Column(db.Integer, nullable=False)
+    # Submissions with an overall_score, score_sum / scored_submissions is the average
+    scored_submissions = db.Column(db.Integer, nullable=False)
+    score_sum = db.Column(db.Float, nullable=False)
+    refreshed_at = db.Column(db.DateTime, nullable=True)
+
+    @staticmethod
+    def truncate(granularity, moment):
+        """Start of the bucket holding `moment`, weeks start on Monday"""
+        moment = moment.replace(minute=0, second=0, microsecond=0)
+        if granularity == 'hour':
+            return moment
+        moment = moment.replace(hour=0)
+        if granularity == 'day':
+            return moment
+        return moment - timedelta(days=moment.weekday())
+
+
+class DataVersion(db.Model):
+    """
+    Counters bumped in the same transaction as the writes they track, so a cached
+    view can tell whether its data changed with one primary key lookup.
+    """
+    __tablename__ = 'data_version'
+
+    # Submissions, archiving, stats rebuilds and test edits: everything /analytics shows
+    ANALYTICS = 'analytics'
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    @classmethod
+    def current(cls, name=ANALYTICS):
+        return db.session.scalar(db.select(cls.version).where(cls.name == name)) or 0
+
+    @classmethod
+    def bump(cls, executor, name=ANALYTICS):
+        """Increment the counter on `executor` (a Session or Connection), in its transaction"""
+        upsert(executor, cls.__table__, {
+            'name': name,
+            'version': 1,
+            'updated_at': datetime.now(timezone.utc),
+        }, ['name'], lambda table, new: {
+            'version': table.c.version + 1,
+            'updated_at': new.updated_at,
+        })
+
+
+class TestImportJob(db.Model):
+    """
+    An archive import started through POST /import_tests, which responds with the
+    job id while `transcriptionController.run_import_job` imports in the background.
+    Stored rather than kept in memory so any worker can report on it.
+    """
+    __tablename__ = 'test_import_job'
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    id = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default=PENDING)
+    requested_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    # import_tests's result once done, the error when the whole archive was rejected
+    result = db.Column(JSONType, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def serialize(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class TranscriptErrorOutcome(db.Model):
+    """Whether a single seeded error of a test was fixed in a submission"""
+    __table_args__ = (
+        # Missed/fixed counts per seeded error of a test
+        db.Index('ix_transcript_error_outcome_test_id_error_id', 'test_id', 'error_id', 'fixed'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_transcript_id = db.Column(db.Integer, db.ForeignKey(
+        'user_transcript.id'), nullable=False, index=True)
+    # Denormalized from UserTranscript.test_taken so per-test queries skip the join
+    test_id = db.Column(db.Integer, db.ForeignKey(
+        'transcript_test.id'), nullable=False)
+    error_id = db.Column(db.String(20), nullable=False)  # e.g. "E3"
+    # replace / delete / insert, NULL when unknown for backfilled rows
+    error_type = db.Column(db.String(20), nullable=True)
+    fixed = db.Column(db.Boolean, nullable=False)
+
+    def __repr__(self):
+        return f'<TranscriptErrorOutcome {self.user_transcript_id}:{self.error_id}>'
@@ -0,0 +1,10 @@
+from flask import Blueprint
+from controllers import adminController
+from controllers.adminController import metrics_access
+
+admin = Blueprint('admin', __name__)
+
+@admin.route('/metrics', methods=['GET'])
+@metrics_access
+def metrics():
+    return adminController.metrics()
@@ -1,17 +1,110 @@
-from flask import Blueprint, render_template
+import click
+from flask import Blueprint, abort, render_template
 from flask_login import login_required
-from controllers.analyticsController import analyze
+from controllers.adminController import admin_required
+from controllers.analyticsController import (export_scores_csv, get_activity, get_leaderboard, get_test_error_heatmap,
+                                             get_user_stats, rebuild_error_stats, rebuild_session_stats,
+                                             refresh_activity, test_error_heatmap, user_stats, write_export_csv,
+                                             write_export_parquet)
+from models.transcript import TranscriptTest
+from utility.response_cache import versioned_response
 
 analytics = Blueprint('analytics', __name__)
 
 @analytics.route('/stats', methods=['GET'])
 @login_required
+@versioned_response
 def stats():
-    data = analyze()
-    print("Data being passed to template:", data)  # Debug print
-    return render_template('stats.html', **data)
+    # Leaderboard rows are fetched page by page from /analytics/leaderboard
+    return render_template('stats.html', tests=TranscriptTest.summaries())
+
+@analytics.route('/leaderboard', methods=['GET'])
+@login_required
+@versioned_response
+def leaderboard():
+    return get_leaderboard()
+
+@analytics.route('/activity', methods=['GET'])
+@login_required
+@versioned_response
+def activity():
+    return get_activity()
+
+@analytics.route('/export.csv', methods=['GET'])
+@admin_required
+def export_csv():
+    return export_scores_csv()
 
 @analytics.route('/stats/user/<int:user_id>', methods=['GET'])
 @login_required
-def user_stats(user_id):
-    return render_template('user_stats.html', user_id=user_id)
\ No newline at end of file
+@versioned_response
+def user_stats_page(user_id):
+    stats = user_stats(user_id)
+    if stats is None:
+        abort(404)
+    return render_template('user_stats.html', user_id=user_id, stats=stats)
+
+@analytics.route('/stats/user/<int:user_id>/data', methods=['GET'])
+@login_required
+@versioned_response
+def user_stats_data(user_id):
+    return get_user_stats(user_id)
+
+@analytics.route('/tests/<int:test_id>/errors', methods=['GET'])
+@login_required
+@versioned_response
+def test_errors_page(test_id):
+    heatmap = test_error_heatmap(test_id)
+    if heatmap is None:
+        abort(404)
+    return render_template('test_errors.html', test_id=test_id, heatmap=heatmap)
+
+@analytics.route('/tests/<int:test_id>/errors/data', methods=['GET'])
+@login_required
+@versioned_response
+def test_errors_data(test_id):
+    return get_test_error_heatmap(test_id)
+
+
+@analytics.cli.command('rebuild-session-stats')
+def rebuild_session_stats_command():
+    """Recompute testing_session_stats from the live and archived submissions."""
+    count = rebuild_session_stats()
+    click.echo(f'Rebuilt stats for {count} testing sessions')
+
+
+@analytics.cli.command('rebuild-error-stats')
+@click.option('--batch-size', default=1000, show_default=True, help='Archived submissions fetched per round trip')
+def rebuild_error_stats_command(batch_size):
+    """Recompute test_error_stats from the live and archived error outcomes."""
+    count = rebuild_error_stats(batch_size)
+    click.echo(f'Rebuilt missed counts for {count} seeded errors')
+
+
+@analytics.cli.command('refresh-activity')
+@click.option('--full', is_flag=True, help='Rebuild every bucket instead of the last hours')
+def refresh_activity_command(full):
+    """Bring the hour/day/week activity buckets up to date."""
+    count = refresh_activity(full)
+    click.echo(f'Refreshed {count} hour buckets')
+
+
+@analytics.cli.command('export-scores')
+@click.option('--output', '-o', required=True, type=click.Path(dir_okay=False), help='File to write')
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'parquet']), default=None,
+              help='Defaults to the output file extension')
+@click.option('--since', type=click.DateTime(), default=None, help='Only submissions created from this date')
+@click.option('--until', type=click.DateTime(), default=None, help='Only submissions created before this date')
+@click.option('--row-group-size', default=50000, show_default=True, help='Rows per Parquet row group')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows fetched per round trip')
+def export_scores_command(output, file_format, since, until, row_group_size, batch_size):
+    """Export every submission with user and test names, streamed from the database."""
+    file_format = file_format or ('parquet' if output.endswith('.parquet') else 'csv')
+    if file_format == 'parquet':
+        try:
+            count = write_export_parquet(output, since, until, row_group_size, batch_size)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+    else:
+        count = write_export_csv(output, since, until, batch_size)
+    click.echo(f'Exported {count} submissions to {output}')
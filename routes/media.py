@@ -0,0 +1,19 @@
+import click
+from flask import Blueprint
+from controllers import mediaController
+
+media = Blueprint('media', __name__)
+
+# Templates build audio URLs with audio_url(test.audio_file_path)
+media.app_template_global('audio_url')(mediaController.audio_url)
+
+@media.route('/audio/<fingerprint>/<path:filename>', methods=['GET'])
+def audio(fingerprint, filename):
+    return mediaController.serve_audio(fingerprint, filename)
+
+
+@media.cli.command('content-address-audio')
+def content_address_audio_command():
+    """Rename audio files stored before uploads were content-addressed to their content hash."""
+    renamed, missing = mediaController.content_address_audio()
+    click.echo(f'Renamed {renamed} audio files, {missing} missing')
@@ -1,12 +1,14 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
-import re
+import click
 from time import sleep
-from flask import Blueprint, Response, render_template, request, redirect, url_for, flash
+from flask import Blueprint, Response, current_app, render_template, request, redirect, url_for, flash
 from flask_socketio import SocketIO, emit
 from flask_login import login_required, current_user
 from controllers import transcriptionController
+from controllers.adminController import admin_required
 from models.transcript import TranscriptTest
+from utility import test_ingest
 
 
 transcription = Blueprint('transcription', __name__)
@@ -21,43 +23,22 @@ class SubtitleEntry:
         self.text = text
 
 
-def parse_time(time_str):
-    """Convert SRT timestamp to seconds"""
-    time_obj = datetime.strptime(time_str.replace(',', '.'), '%H:%M:%S.%f')
-    return time_obj.hour * 3600 + time_obj.minute * 60 + time_obj.second + time_obj.microsecond / 1000000
-
-
 class SRTHandler:
     def __init__(self):
         self._subtitle_cache = {}  # Cache for parsed subtitles
 
-    def read_srt_file(self, file_path):
-        """Read and cache SRT file if not already cached"""
-        if file_path not in self._subtitle_cache:
-            entries = []
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read().strip()
-                blocks = content.split('\n\n')
-
-                for block in blocks:
-                    lines = block.split('\n')
-                    if len(lines) >= 3:
-                        index = int(lines[0])
-                        time_line = lines[1]
-                        text = '\n'.join(lines[2:])
-
-                        time_match = re.match(
-                            r'(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})', time_line)
-                        if time_match:
-                            start_time = parse_time(time_match.group(1))
-                            end_time = parse_time(time_match.group(2))
-                            entries.append(SubtitleEntry(
-                                index, start_time, end_time, text))
-
-            self._subtitle_cache[file_path] = sorted(
-                entries, key=lambda x: x.start_time)
-
-        return self._subtitle_cache[file_path]
+    def read_test_cues(self, test_id):
+        """Cache the cues of a test, from its ingest results when it has them"""
+        key = ('test', test_id)
+        if key not in self._subtitle_cache:
+            cues = transcriptionController.get_srt_cues(test_id)
+            if cues is None:
+                return []
+            # A test's captions never change: a new SRT means a new test
+            self._subtitle_cache[key] = [
+                SubtitleEntry(cue['index'], cue['start'], cue['end'], cue['text']) for cue in cues]
+
+        return self._subtitle_cache[key]
 
     def find_subtitle_at_time(self, entries, current_time):
         """Find the subtitle that should be displayed at the given time"""
@@ -84,7 +65,7 @@ def handle_connect():
 def handle_transcription(data):
     """
     Handle transcription requests via WebSocket
-    Expects data with currentTime and fileId
+    Expects data with currentTime and test_id
     """
     try:
         current_time = float(data.get('currentTime', 0))
@@ -92,10 +73,13 @@ def handle_transcription(data):
         # Use a default file path
         # srtFile = './files/caption_call.srt'
         # srtFile = './files/harvard.srt'
-        srtFile = data.get('srt_file')
+        test_id = data.get('test_id')
+        if not test_id:
+            emit('transcription_error', {'error': 'A test id is required'})
+            return
 
         # Get subtitle entries (cached if already read)
-        subtitle_entries = srt_handler.read_srt_file(srtFile)
+        subtitle_entries = srt_handler.read_test_cues(int(test_id))
 
         # Find current subtitle
         current_subtitle = srt_handler.find_subtitle_at_time(
@@ -140,14 +124,25 @@ def create_test():
     return render_template('create_test.html')
 
 
+@transcription.route('/import_tests', methods=['POST'])
+@admin_required
+def import_tests():
+    return transcriptionController.import_tests_upload()
+
+
+@transcription.route('/import_tests/<job_id>', methods=['GET'])
+@admin_required
+def import_job(job_id):
+    return transcriptionController.get_import_job(job_id)
+
+
 @transcription.route('/edit_test/<int:id>', methods=['GET', 'PATCH'])
 @login_required
 def edit_test(id):
     if request.method == 'PATCH':
         return transcriptionController.edit_test(id)
     elif request.method == 'GET':
-        test_data = TranscriptTest.query.get(
-            id)  # Assuming you have a Test model
+        test_data = TranscriptTest.get_with_transcripts(id)
         return render_template('edit_test.html', test=test_data)
 
 
@@ -162,3 +157,56 @@ def get_tests():
 def take_test():
     if request.method == 'GET':
         return transcriptionController.take_tests()
+
+
+@transcription.cli.command('backfill-error-outcomes')
+@click.option('--batch-size', default=500, show_default=True, help='Submissions per transaction')
+def backfill_error_outcomes_command(batch_size):
+    """Create per-error outcome rows for submissions scored before they were stored."""
+    count = transcriptionController.backfill_error_outcomes(batch_size)
+    click.echo(f'Backfilled error outcomes for {count} submissions')
+
+
+@transcription.cli.command('ingest-tests')
+@click.option('--all', 'reingest', is_flag=True, help='Ingest every test again, not only those never ingested')
+def ingest_tests_command(reingest):
+    """Precompute seeded errors, SRT cues and benchmark scores of existing tests."""
+    ingested, failed = transcriptionController.ingest_tests(reingest)
+    click.echo(f'Ingested {ingested} tests, {failed} failed validation (see the log)')
+
+
+@transcription.cli.command('import-tests')
+@click.argument('archive', type=click.Path(exists=True, dir_okay=False))
+@click.option('--workers', type=int, default=None, help='Worker processes  [default: TEST_IMPORT_WORKERS]')
+@click.option('--batch-size', type=int, default=None, help='Tests per transaction  [default: TEST_IMPORT_BATCH_SIZE]')
+def import_tests_command(archive, workers, batch_size):
+    """Import the tests listed in ARCHIVE's manifest.json (a zip with the transcripts, SRT and audio files)."""
+    try:
+        result = transcriptionController.import_tests(
+            archive, workers or current_app.config['TEST_IMPORT_WORKERS'],
+            batch_size or current_app.config['TEST_IMPORT_BATCH_SIZE'])
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for failure in result['failed']:
+        click.echo(f"Entry {failure['position']} ({failure['name']}): {failure['error']}", err=True)
+    click.echo(f"Imported {len(result['imported'])} tests, skipped {len(result['skipped'])} existing, "
+               f"{len(result['failed'])} failed")
+
+
+@transcription.cli.command('compact-transcripts')
+@click.option('--batch-size', default=500, show_default=True, help='Submissions per transaction')
+def compact_transcripts_command(batch_size):
+    """Store existing submissions as deltas against their test's bad transcript."""
+    compacted, examined = transcriptionController.compact_transcripts(batch_size)
+    click.echo(f'Compacted {compacted} of {examined} submissions')
+
+
+@transcription.cli.command('archive-submissions')
+@click.option('--older-than-days', default=365, show_default=True, type=int,
+              help='Archive submissions created more than this many days ago')
+@click.option('--batch-size', default=500, show_default=True, help='Submissions per transaction')
+def archive_submissions_command(older_than_days, batch_size):
+    """Move old submissions to user_transcript_archive and fold them into the per-user/per-test rollups."""
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    count = transcriptionController.archive_submissions(cutoff, batch_size)
+    click.echo(f'Archived {count} submissions created before {cutoff:%Y-%m-%d %H:%M}')
@@ -35,6 +35,15 @@ document.addEventListener('DOMContentLoaded', () => {
     socket: null,
     lastTime: -1,
     transcriptHistory: [], // Store transcript segments
+    aiEvaluations: {}, // Streamed AI feedback keyed by user transcript id
+  };
+
+  // Render streamed AI feedback into the score modal (if it is already showing)
+  const renderAiEvaluation = userTranscriptId => {
+    const container = document.getElementById(`ai-evaluation-${userTranscriptId}`);
+    if (container) {
+      container.innerHTML = state.aiEvaluations[userTranscriptId];
+    }
   };
 
   // Initialize WebSocket connection
@@ -51,6 +60,34 @@ document.addEventListener('DOMContentLoaded', () => {
       updateEditableTranscript(data);
     });
 
+    state.socket.on('ai_evaluation_chunk', data => {
+      state.aiEvaluations[data.user_transcript_id] = (state.aiEvaluations[data.user_transcript_id] || '') + data.chunk;
+      renderAiEvaluation(data.user_transcript_id);
+    });
+
+    state.socket.on('ai_evaluation_complete', data => {
+      state.aiEvaluations[data.user_transcript_id] = data.aiEvaluation;
+      renderAiEvaluation(data.user_transcript_id);
+    });
+
+    // A submission answered with 202 gets its id once its write-behind batch commits
+    state.socket.on('submission_saved', data => {
+      const container = document.getElementById(`ai-evaluation-${data.submission_id}`);
+      if (container) {
+        container.id = `ai-evaluation-${data.user_transcript_id}`;
+      }
+      if (state.aiEvaluations[data.user_transcript_id]) {
+        renderAiEvaluation(data.user_transcript_id);
+      }
+    });
+
+    state.socket.on('submission_failed', data => {
+      const container = document.getElementById(`ai-evaluation-${data.submission_id}`);
+      if (container) {
+        container.textContent = 'This submission could not be saved.';
+      }
+    });
+
     state.socket.on('disconnect', () => {
       console.log('WebSocket disconnected');
     });
@@ -223,7 +260,7 @@ document.addEventListener('DOMContentLoaded', () => {
       state.lastTime = currentTime;
       state.socket.emit('request_transcription', {
         currentTime: currentTime,
-        srt_file: elements.srtToStream.value,
+        test_id: elements.testId.value,
       });
     }
   };
@@ -234,7 +271,7 @@ document.addEventListener('DOMContentLoaded', () => {
       elements.audioPlayer.controls = false;
       state.socket.emit('request_transcription', {
         currentTime: elements.audioPlayer.currentTime,
-        srt_file: elements.srtToStream.value,
+        test_id: elements.testId.value,
       });
     });
 
@@ -293,6 +330,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     const data = {
       transcript: transcriptValue,
+      sid: state.socket.id,
     };
 
     const testId = elements.testId.value;
@@ -374,7 +412,13 @@ document.addEventListener('DOMContentLoaded', () => {
 
               <div class="mt-4">
                 <h4 class="font-semibold text-gray-700 mb-2">AI Evaluation:</h4>
-                <p class="text-lg font-medium text-gray-700 mb-2">AI Evaluation: ${data.aiEvaluation}</p>
+                <div class="text-lg font-medium text-gray-700 mb-2" id="ai-evaluation-${data.user_transcript_id || data.submission_id}">${
+                  ['streaming', 'pending'].includes(data.aiEvaluationStatus)
+                    ? state.aiEvaluations[data.user_transcript_id] || 'Generating AI evaluation...'
+                    : data.aiEvaluationStatus === 'skipped'
+                      ? 'AI evaluation skipped: the AI service is temporarily unavailable.'
+                      : data.aiEvaluation || 'No AI evaluation available'
+                }</div>
                 <h4 class="font-semibold text-gray-700 mb-2">Missed Errors:</h4>
                 <ul class="list-disc pl-5 space-y-1">
                   ${errorTracking.missed_errors
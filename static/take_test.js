@@ -75,6 +75,15 @@ window.addEventListener('load', function () {
     lastTime: -1,
     transcriptHistory: [], // Store transcript segments
     transcriptions: [], // Store transcriptions to be sent to server
+    aiEvaluations: {}, // Streamed AI feedback keyed by user transcript id
+  };
+
+  // Render streamed AI feedback into its result block (if the modal is already showing it)
+  const renderAiEvaluation = userTranscriptId => {
+    const container = document.getElementById(`ai-evaluation-${userTranscriptId}`);
+    if (container) {
+      container.innerHTML = state.aiEvaluations[userTranscriptId];
+    }
   };
 
   // Audio Player Event Handlers
@@ -88,7 +97,7 @@ window.addEventListener('load', function () {
       state.lastTime = currentTime;
       state.socket.emit('request_transcription', {
         currentTime: currentTime,
-        srt_file: elements.srtToStream.value,
+        test_id: elements.testId.value,
       });
     }
   };
@@ -107,6 +116,34 @@ window.addEventListener('load', function () {
       updateEditableTranscript(data);
     });
 
+    state.socket.on('ai_evaluation_chunk', data => {
+      state.aiEvaluations[data.user_transcript_id] = (state.aiEvaluations[data.user_transcript_id] || '') + data.chunk;
+      renderAiEvaluation(data.user_transcript_id);
+    });
+
+    state.socket.on('ai_evaluation_complete', data => {
+      state.aiEvaluations[data.user_transcript_id] = data.aiEvaluation;
+      renderAiEvaluation(data.user_transcript_id);
+    });
+
+    // A submission answered with 202 gets its id once its write-behind batch commits
+    state.socket.on('submission_saved', data => {
+      const container = document.getElementById(`ai-evaluation-${data.submission_id}`);
+      if (container) {
+        container.id = `ai-evaluation-${data.user_transcript_id}`;
+      }
+      if (state.aiEvaluations[data.user_transcript_id]) {
+        renderAiEvaluation(data.user_transcript_id);
+      }
+    });
+
+    state.socket.on('submission_failed', data => {
+      const container = document.getElementById(`ai-evaluation-${data.submission_id}`);
+      if (container) {
+        container.textContent = 'This submission could not be saved.';
+      }
+    });
+
     state.socket.on('disconnect', () => {
       console.log('WebSocket disconnected');
     });
@@ -248,7 +285,7 @@ window.addEventListener('load', function () {
       elements.audioPlayer.controls = true;
       state.socket.emit('request_transcription', {
         currentTime: elements.audioPlayer.currentTime,
-        srt_file: elements.srtToStream.value,
+        test_id: elements.testId.value,
       });
     });
 
@@ -297,6 +334,7 @@ window.addEventListener('load', function () {
       testingId: elements.testingId.value,
       testId: initialTestId,
       transcript: transcriptValue,
+      sid: state.socket.id,
     };
 
     if (!state.transcriptions.some(item => item.testId === userTranscriptItem.testId)) {
@@ -359,7 +397,13 @@ window.addEventListener('load', function () {
           
                   <div class="ai-evaluation mt-4">
                     <h4 class="font-semibold mb-2">AI Evaluation:</h4>
-                    <div class="mb-2">${result.aiEvaluation || 'No AI evaluation available'}</div>
+                    <div class="mb-2" id="ai-evaluation-${result.user_transcript_id || result.submission_id}">${
+                      ['streaming', 'pending'].includes(result.aiEvaluationStatus)
+                        ? state.aiEvaluations[result.user_transcript_id] || 'Generating AI evaluation...'
+                        : result.aiEvaluationStatus === 'skipped'
+                          ? 'AI evaluation skipped: the AI service is temporarily unavailable.'
+                          : result.aiEvaluation || 'No AI evaluation available'
+                    }</div>
                   </div>
                   
                   ${
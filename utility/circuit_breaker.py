@@ -0,0 +1,95 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker for calls to an unreliable upstream service.
+
+    The breaker opens when the failure rate over the last `window` calls reaches
+    `error_rate` (once at least `min_calls` have been recorded). While open every
+    call is refused; after `cooldown` seconds a single trial call is let through
+    (half-open) and its outcome decides whether the breaker closes again.
+
+    A caller granted a call it does not make gives it back with `release`. A
+    trial that reports nothing within `trial_timeout` seconds is written off and
+    the next call becomes the trial, so a lost trial cannot keep the breaker
+    half-open forever.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, error_rate: float = 0.5, window: int = 20,
+                 min_calls: int = 5, cooldown: float = 30.0, trial_timeout: float = 120.0):
+        self.name = name
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.trial_timeout = trial_timeout
+        self._outcomes = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if a call to the upstream service may be attempted"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if self._state == self.OPEN and now - self._opened_at >= self.cooldown:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if (self._state == self.HALF_OPEN and self._trial_in_flight
+                    and now - self._trial_started_at >= self.trial_timeout):
+                logger.warning(f"Circuit '{self.name}' trial call did not report within {self.trial_timeout}s")
+                self._trial_in_flight = False
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._trial_started_at = now
+                return True
+            return False
+
+    def release(self):
+        """Give back a call granted by `allow_request` that was not made, without an outcome"""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                logger.info(f"Circuit '{self.name}' closed after successful trial call")
+                self._state = self.CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trip()
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if (self._state == self.CLOSED and len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.error_rate):
+                self._trip()
+
+    def _trip(self):
+        logger.warning(f"Circuit '{self.name}' opened, skipping calls for {self.cooldown}s")
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
@@ -0,0 +1,201 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Recent samples kept for the percentiles
+SAMPLE_SIZE = 1024
+
+
+class _Timing:
+    """Count, total, max and recent samples of a duration, in milliseconds"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def observe(self, ms: float):
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        self.samples.append(ms)
+
+    def snapshot(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+
+        def percentile(p):
+            return round(ordered[min(int(len(ordered) * p), len(ordered) - 1)], 3) if ordered else 0.0
+
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max, 3),
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+        }
+
+
+class PoolMetrics:
+    """
+    Connection pool statistics for one engine, in this process.
+
+    - checkout_wait: time from `engine.connect()` until the pool hands over a
+      connection, including waiting for a free one and opening a new one
+    - connect: time to open a new database connection
+    - pre_ping / pre_ping_failures: the liveness check of a pooled connection on
+      checkout, and the checks that found it dead
+    - in_use / peak_in_use: connections currently and at most checked out
+    - overflow / peak_overflow: connections open beyond pool_size, now and at most
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.checkout_wait = _Timing()
+        self.connect = _Timing()
+        self.pre_ping = _Timing()
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.timeouts = 0
+        self.pre_ping_failures = 0
+        self.invalidations = 0
+
+    def snapshot(self) -> Dict:
+        pool = self.engine.pool
+        with self._lock:
+            data = {
+                'pool_class': type(pool).__name__,
+                'in_use': self.in_use,
+                'peak_in_use': self.peak_in_use,
+                'timeouts': self.timeouts,
+                'invalidations': self.invalidations,
+                'pre_ping_failures': self.pre_ping_failures,
+                'checkout_wait': self.checkout_wait.snapshot(),
+                'connect': self.connect.snapshot(),
+                'pre_ping': self.pre_ping.snapshot(),
+            }
+        # QueuePool only
+        for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+            if hasattr(pool, name):
+                data[name] = getattr(pool, name)()
+        if hasattr(pool, 'timeout'):
+            data['peak_overflow'] = max(data['peak_in_use'] - data['size'], 0)
+            data['timeout'] = pool.timeout()
+        return data
+
+
+_metrics: Dict[str, PoolMetrics] = {}
+
+
+def instrument_engine(engine: Engine, name: Optional[str] = None, pre_ping: bool = False) -> PoolMetrics:
+    """
+    Attach pool metrics to `engine` and return them. Safe to call more than once.
+
+    Pool events registered on the engine (connect, checkout, checkin, invalidate)
+    are carried over to every pool it creates, so the metrics survive
+    `engine.dispose()` and pool recreation. No event fires before a checkout
+    starts waiting, so `engine.connect()` is wrapped to stamp the start time;
+    the checkout event closes the measurement.
+
+    With `pre_ping`, the checkout event also checks pooled connections with the
+    dialect's `do_ping()` and times it. Leave the engine's own `pool_pre_ping`
+    off then: a dead connection raises `InvalidatePoolError`, on which the pool
+    drops its stale connections and retries with a new one, as it does for its
+    built-in pre-ping.
+    """
+    name = name or 'default'
+    metrics = _metrics.get(name)
+    if metrics is not None and metrics.engine is engine:
+        return metrics
+    metrics = PoolMetrics(engine)
+    local = metrics._local
+
+    connect = engine.connect
+
+    def timed_connect():
+        local.waiting_since = time.perf_counter()
+        try:
+            return connect()
+        except exc.TimeoutError:
+            with metrics._lock:
+                metrics.timeouts += 1
+            raise
+        finally:
+            local.waiting_since = None
+
+    engine.connect = timed_connect
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_out_at = time.perf_counter()
+        waiting_since = getattr(local, 'waiting_since', None)
+        local.waiting_since = None
+        with metrics._lock:
+            if waiting_since is not None:
+                metrics.checkout_wait.observe((checked_out_at - waiting_since) * 1000)
+            metrics.in_use += 1
+            metrics.peak_in_use = max(metrics.peak_in_use, metrics.in_use)
+
+        # A connection opened for this checkout needs no check
+        if not pre_ping or connection_record.info.pop('fresh', False):
+            return
+        try:
+            alive = engine.dialect.do_ping(dbapi_connection)
+        except engine.dialect.loaded_dbapi.Error as e:
+            if not engine.dialect.is_disconnect(e, dbapi_connection, None):
+                raise
+            alive = False
+        with metrics._lock:
+            metrics.pre_ping.observe((time.perf_counter() - checked_out_at) * 1000)
+            if not alive:
+                metrics.pre_ping_failures += 1
+                # The pool retries without a checkin
+                metrics.in_use = max(metrics.in_use - 1, 0)
+        if not alive:
+            raise exc.InvalidatePoolError()
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        with metrics._lock:
+            metrics.in_use = max(metrics.in_use - 1, 0)
+
+    @event.listens_for(engine, 'invalidate')
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        with metrics._lock:
+            metrics.invalidations += 1
+
+    # Connect time: from the engine's do_connect to the pool's connect event
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        connection_record.info['fresh'] = True
+        opened_at = connection_record.info.pop('opening_at', None)
+        if opened_at is not None:
+            with metrics._lock:
+                metrics.connect.observe((time.perf_counter() - opened_at) * 1000)
+
+    @event.listens_for(engine, 'do_connect')
+    def on_do_connect(dialect, conn_rec, cargs, cparams):
+        conn_rec.info['opening_at'] = time.perf_counter()
+
+    _metrics[name] = metrics
+    logger.info(f'Instrumented connection pool for bind {name}: {engine.pool.status()}')
+    return metrics
+
+
+def pool_stats() -> Dict:
+    """Snapshot of every instrumented pool in this worker process"""
+    return {
+        'pid': os.getpid(),
+        'pools': {name: metrics.snapshot() for name, metrics in _metrics.items()},
+    }
@@ -0,0 +1,58 @@
+import hashlib
+import logging
+from functools import wraps
+
+from flask import current_app, make_response, request
+from config.replica import replica_reads
+from models.transcript import DataVersion
+from utility.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Rendered responses per worker process, keyed by (path with query, data version)
+_responses = TTLCache(max_entries=256)
+
+
+@replica_reads
+def current_data_version() -> int:
+    """
+    The analytics data version, read where the views read their data: a replica
+    never serves data older than the version it reports.
+    """
+    return DataVersion.current(DataVersion.ANALYTICS)
+
+
+def versioned_response(view):
+    """
+    Caches a view's 200 responses by request path and analytics data version, and
+    answers a matching If-None-Match with 304 without running the view.
+
+    The data version is bumped in the same transaction as every submission (and
+    archiving, stats rebuilds, test edits), so an entry is served only while the
+    data it was rendered from is unchanged; the cost of an unchanged view is one
+    primary key lookup. Responses are marked `private, no-cache`: browsers keep
+    them but revalidate with the ETag on each load.
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        version = current_data_version()
+        path = request.full_path
+        etag = hashlib.sha1(f'{version}:{path}'.encode()).hexdigest()
+
+        if etag in request.if_none_match:
+            response = current_app.response_class(status=304)
+        else:
+            key = (path, version)
+            cached = _responses.get(key, current_app.config['ANALYTICS_RESPONSE_CACHE_TTL'])
+            if cached is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                cached = (response.get_data(), response.content_type)
+                _responses.set(key, cached)
+            response = current_app.response_class(cached[0], content_type=cached[1])
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapped
@@ -0,0 +1,120 @@
+import io
+import json
+import os
+import zipfile
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from utility import test_ingest
+from utility.uploads import store_upload
+
+# At the archive root: {"tests": [{"name", "good_transcript", "bad_transcript", "srt", "audio"}, ...]},
+# the last four are paths of members of the archive; "benchmark_score" is optional
+MANIFEST_NAME = 'manifest.json'
+REQUIRED_FIELDS = ('name', 'good_transcript', 'bad_transcript', 'srt', 'audio')
+# Longest values TranscriptTest.name_of_test and its transcripts hold
+MAX_NAME_LENGTH = 150
+MAX_TRANSCRIPT_LENGTH = 15000
+
+# Archive opened once per worker process by open_archive
+_archive = None
+
+
+def read_manifest(archive_path: str) -> List[Dict[str, Any]]:
+    """
+    The test entries listed in the archive's manifest
+
+    Raises:
+        ValueError: The file is not a zip archive or has no valid manifest
+    """
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            manifest = json.loads(archive.read(MANIFEST_NAME))
+    except zipfile.BadZipFile:
+        raise ValueError('The archive is not a zip file')
+    except KeyError:
+        raise ValueError(f'The archive has no {MANIFEST_NAME}')
+    tests = manifest.get('tests') if isinstance(manifest, dict) else manifest
+    if not isinstance(tests, list):
+        raise ValueError(f'{MANIFEST_NAME} must hold a list of tests')
+    return tests
+
+
+def open_archive(archive_path: str):
+    """Worker process initializer"""
+    global _archive
+    _archive = zipfile.ZipFile(archive_path)
+
+
+def _open(name: str):
+    try:
+        return _archive.open(name)
+    except KeyError:
+        raise ValueError(f'{name} is not in the archive')
+
+
+def _read(name: str) -> bytes:
+    with _open(name) as member:
+        return member.read()
+
+
+def entry_name(entry: Any) -> Optional[str]:
+    """The entry's test name, or None when it has no usable one"""
+    name = entry.get('name') if isinstance(entry, dict) else None
+    if not isinstance(name, str) or not name.strip() or len(name) > MAX_NAME_LENGTH:
+        return None
+    return name
+
+
+def prepare_test(entry: Dict[str, Any], srt_folder: str, audio_folder: str, audio_extensions) -> Dict[str, Any]:
+    """
+    Worker process task: validates and ingests one manifest entry, then stores its
+    SRT and audio in content-addressed storage (utility.uploads)
+
+    Returns:
+        Column values of the TranscriptTest row to insert
+
+    Raises:
+        ValueError: The entry, its files or its transcripts are invalid
+    """
+    if not isinstance(entry, dict):
+        raise ValueError('Manifest entries must be objects')
+    missing = [field for field in REQUIRED_FIELDS if not entry.get(field)]
+    if missing:
+        raise ValueError(f'Missing fields: {", ".join(missing)}')
+    not_strings = [field for field in REQUIRED_FIELDS if not isinstance(entry[field], str)]
+    if not_strings:
+        raise ValueError(f'Fields must be strings: {", ".join(not_strings)}')
+    if entry_name(entry) is None:
+        raise ValueError(f'name must not be blank or longer than {MAX_NAME_LENGTH} characters')
+    benchmark_score = entry.get('benchmark_score')
+    # bool is an int, but not a score
+    if benchmark_score is not None and (
+            isinstance(benchmark_score, bool) or not isinstance(benchmark_score, (int, float))):
+        raise ValueError('benchmark_score must be a number')
+    audio_extension = os.path.splitext(entry['audio'])[1].lower()
+    if audio_extension.lstrip('.') not in audio_extensions:
+        raise ValueError(f'Invalid audio file format: {entry["audio"]}')
+
+    good_transcript = _read(entry['good_transcript']).decode('utf-8')
+    bad_transcript = _read(entry['bad_transcript']).decode('utf-8')
+    if max(len(good_transcript), len(bad_transcript)) > MAX_TRANSCRIPT_LENGTH:
+        raise ValueError(f'Transcripts must be at most {MAX_TRANSCRIPT_LENGTH} characters')
+    srt = _read(entry['srt'])
+    result = test_ingest.ingest(good_transcript, bad_transcript, srt.decode('utf-8'))
+
+    # Files are only stored for entries that passed validation
+    stored_srt = store_upload(io.BytesIO(srt), srt_folder, '.srt')
+    with _open(entry['audio']) as audio:
+        stored_audio = store_upload(audio, audio_folder, audio_extension)
+
+    return {
+        'name_of_test': entry['name'],
+        'good_transcript': good_transcript,
+        'bad_transcript': bad_transcript,
+        'srt_file_path': f'./files/{stored_srt.filename}',
+        'audio_file_path': f'/audio/{stored_audio.filename}',
+        'seeded_errors': result['seeded_errors'],
+        'srt_cues': result['srt_cues'],
+        'benchmark_score': result['benchmark_score'] if benchmark_score is None else float(benchmark_score),
+        'ingested_at': datetime.now(timezone.utc),
+    }
@@ -0,0 +1,80 @@
+import re
+from typing import Any, Dict, List, Optional
+from utility import transcript_compare
+
+# Blocks are separated by blank lines: index, timing line, one or more text lines
+SRT_BLOCK_SEPARATOR = re.compile(r'\n[ \t]*\n')
+SRT_TIMING = re.compile(r'(\d{2}):(\d{2}):(\d{2}),(\d{3}) --> (\d{2}):(\d{2}):(\d{2}),(\d{3})')
+
+
+def _seconds(hours, minutes, seconds, millis):
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000
+
+
+def parse_srt(content: str) -> List[Dict[str, Any]]:
+    """
+    Parse SRT content into cues sorted by start time
+
+    Returns:
+        [{'index', 'start', 'end', 'text'}], times in seconds
+
+    Raises:
+        ValueError: A block has a non-numeric index
+    """
+    content = content.lstrip('\ufeff').replace('\r\n', '\n').strip()
+    cues = []
+    for block in SRT_BLOCK_SEPARATOR.split(content):
+        lines = block.split('\n')
+        if len(lines) < 3:
+            continue
+        timing = SRT_TIMING.match(lines[1])
+        if not timing:
+            continue
+        try:
+            index = int(lines[0])
+        except ValueError:
+            raise ValueError(f'Invalid SRT cue index: {lines[0]!r}')
+        cues.append({
+            'index': index,
+            'start': _seconds(*timing.groups()[:4]),
+            'end': _seconds(*timing.groups()[4:]),
+            'text': '\n'.join(lines[2:]),
+        })
+    return sorted(cues, key=lambda cue: cue['start'])
+
+
+def ingest(good_transcript: str, bad_transcript: str, srt_content: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Validate a test and precompute what scoring would otherwise redo per submission
+
+    Parameters:
+        good_transcript: The transcript submissions are scored against
+        bad_transcript: The transcript with the seeded errors, shown to trainees
+        srt_content: Captions for the audio, if uploaded
+
+    Returns:
+        {'seeded_errors', 'srt_cues', 'benchmark_score'}: the seeded errors as
+        stored by TranscriptTest (see transcript_compare.errors_from_seeded), the
+        cues from parse_srt or None, and the score of the bad transcript submitted
+        unchanged
+
+    Raises:
+        ValueError: The transcripts do not differ, or the SRT has no cues
+    """
+    errors = transcript_compare.generate_introduced_errors(good_transcript, bad_transcript)
+    if not errors:
+        raise ValueError('The test transcript has no seeded errors, it is identical to the scoring transcript')
+    seeded_errors = transcript_compare.errors_to_seeded(errors)
+
+    srt_cues = None
+    if srt_content is not None:
+        srt_cues = parse_srt(srt_content)
+        if not srt_cues:
+            raise ValueError('The SRT file has no cues')
+
+    benchmark = transcript_compare.score_user_transcript(good_transcript, bad_transcript, bad_transcript, errors)
+    return {
+        'seeded_errors': seeded_errors,
+        'srt_cues': srt_cues,
+        'benchmark_score': benchmark['percentage'],
+    }
@@ -0,0 +1,73 @@
+import logging
+import random
+import threading
+import time
+from typing import List, Optional
+
+from flask import current_app
+from config.extensions import db
+from models.transcript import TranscriptTest, UserTranscript
+
+logger = logging.getLogger(__name__)
+
+
+class RandomTestSelector:
+    """
+    Picks a random TranscriptTest without loading the whole test library.
+
+    Test ids are cached in process and refreshed after TEST_SELECTION_CACHE_TTL
+    seconds or when `invalidate` is called (on create and edit). Only the chosen
+    row is then fetched, so the cost of a pick does not grow with the library.
+    """
+
+    def __init__(self):
+        self._ids: Optional[List[int]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._ids = None
+
+    def test_ids(self) -> List[int]:
+        ttl = current_app.config['TEST_SELECTION_CACHE_TTL']
+        with self._lock:
+            if self._ids is None or time.monotonic() - self._loaded_at > ttl:
+                self._ids = list(db.session.scalars(db.select(TranscriptTest.id)))
+                self._loaded_at = time.monotonic()
+            return self._ids
+
+    def pick_id(self, user_id: Optional[int] = None) -> Optional[int]:
+        """
+        Pick a random test id. When `user_id` is given, tests the user has not taken
+        yet are TEST_SELECTION_UNTAKEN_WEIGHT times more likely to be picked.
+        """
+        ids = self.test_ids()
+        if not ids:
+            return None
+        if user_id is None:
+            return random.choice(ids)
+
+        taken = set(db.session.scalars(
+            db.select(UserTranscript.test_taken).where(UserTranscript.user_id == user_id).distinct()))
+        untaken_weight = current_app.config['TEST_SELECTION_UNTAKEN_WEIGHT']
+        weights = [1.0 if test_id in taken else untaken_weight for test_id in ids]
+        return random.choices(ids, weights=weights)[0]
+
+    def pick(self, user_id: Optional[int] = None) -> Optional[TranscriptTest]:
+        """Pick a random test and load that single row (transcripts stay deferred)"""
+        test_id = self.pick_id(user_id)
+        if test_id is None:
+            return None
+        test = db.session.get(TranscriptTest, test_id)
+        if test is None:
+            # The cached id list is stale (test removed by another worker), reload once
+            logger.info(f"Test {test_id} no longer exists, refreshing cached test ids")
+            self.invalidate()
+            test_id = self.pick_id(user_id)
+            test = db.session.get(TranscriptTest, test_id) if test_id is not None else None
+        return test
+
+
+# Shared instance used by the views
+random_test_selector = RandomTestSelector()
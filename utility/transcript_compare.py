@@ -106,6 +106,17 @@ def generate_introduced_errors(good_transcript: str, bad_transcript: str) -> Lis
     return errors
 
 
+def errors_to_seeded(errors: List[TranscriptError]) -> List[Dict[str, str]]:
+    """JSON form of the seeded errors, stored on the test at ingest"""
+    return [{"id": e.error_id, "correct": e.correct_text, "error": e.error_text, "type": e.error_type} for e in errors]
+
+
+def errors_from_seeded(seeded: List[Dict[str, str]]) -> List[TranscriptError]:
+    """Fresh TranscriptError objects from errors_to_seeded output, ready to be scored"""
+    return [TranscriptError(error_id=e["id"], correct_text=e["correct"], error_text=e["error"], error_type=e["type"])
+            for e in seeded]
+
+
 def score_user_transcript(good_transcript: str,
                           bad_transcript: str,
                           user_transcript: str,
@@ -213,7 +224,8 @@ def generate_highlighted_transcript(user_transcript: str, missed_errors: List[Di
     return highlighted
 
 
-def compare_transcript_with_errors(good_transcript: str, bad_transcript: str, user_transcript: str) -> Dict[str, Any]:
+def compare_transcript_with_errors(good_transcript: str, bad_transcript: str, user_transcript: str,
+                                   introduced_errors: Optional[List[TranscriptError]] = None) -> Dict[str, Any]:
     """
     Enhanced version of compare_transcript that tracks intentionally introduced errors
 
@@ -221,13 +233,15 @@ def compare_transcript_with_errors(good_transcript: str, bad_transcript: str, us
         good_transcript: The error-free transcript
         bad_transcript: The transcript with intentionally introduced errors
         user_transcript: The transcript submitted by the user
+        introduced_errors: Errors seeded in the test, e.g. from the ingest results (optional - will be generated if not provided)
 
     Returns:
         Dictionary with scoring results and detailed error information
     """
     # First, identify what errors were introduced
-    introduced_errors = generate_introduced_errors(
-        good_transcript, bad_transcript)
+    if introduced_errors is None:
+        introduced_errors = generate_introduced_errors(
+            good_transcript, bad_transcript)
 
     # Score the user's transcript against these introduced errors
     score_results = score_user_transcript(
@@ -250,7 +264,9 @@ def compare_transcript_with_errors(good_transcript: str, bad_transcript: str, us
         'percentage': score_results['percentage'],
         'punctuation_errors': base_comparison.get('punctuation_errors', 0),  # Use .get() with a default value
         'readable_diff': base_comparison['readable_diff'],
-        'message': f"{score_results['message']} Punctuation errors: {base_comparison.get('punctuation_errors', 0)}"
+        'message': f"{score_results['message']} Punctuation errors: {base_comparison.get('punctuation_errors', 0)}",
+        # Per-error outcome, stored as TranscriptErrorOutcome rows
+        'error_outcomes': [{"id": e.error_id, "type": e.error_type, "fixed": e.was_corrected} for e in introduced_errors]
     }
 
 # Your existing compare_transcript function (with slight modifications)
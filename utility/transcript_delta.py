@@ -0,0 +1,65 @@
+import difflib
+import hashlib
+import re
+from typing import List, Union
+
+# Leading whitespace, then each word with its trailing whitespace: joining the tokens gives the text back exactly
+TOKEN_PATTERN = re.compile(r'^\s+|\S+\s*')
+
+# An edit script is a list of operations applied left to right over the base tokens:
+#   int n >= 0  -> copy the next n base tokens
+#   int n < 0   -> skip the next -n base tokens
+#   str s       -> insert s literally
+EditScript = List[Union[int, str]]
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text)
+
+
+def checksum(text: str) -> str:
+    """SHA-256 of the full text, used to verify a reconstruction"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def encode_delta(base: str, text: str) -> EditScript:
+    """
+    Build a compact edit script that turns `base` into `text`
+
+    Parameters:
+        base: The text the script is relative to (the test's bad transcript)
+        text: The text to encode (the user's transcript)
+
+    Returns:
+        The edit script, JSON serializable
+    """
+    base_tokens = tokenize(base)
+    tokens = tokenize(text)
+    matcher = difflib.SequenceMatcher(None, base_tokens, tokens)
+
+    script = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            script.append(i2 - i1)
+            continue
+        if i2 > i1:
+            script.append(-(i2 - i1))
+        if j2 > j1:
+            script.append(''.join(tokens[j1:j2]))
+    return script
+
+
+def apply_delta(base: str, script: EditScript) -> str:
+    """Rebuild the text encoded by `script` against `base`"""
+    base_tokens = tokenize(base)
+    parts = []
+    position = 0
+    for operation in script:
+        if isinstance(operation, str):
+            parts.append(operation)
+        elif operation >= 0:
+            parts.extend(base_tokens[position:position + operation])
+            position += operation
+        else:
+            position -= operation
+    return ''.join(parts)
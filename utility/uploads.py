@@ -0,0 +1,66 @@
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, NamedTuple
+
+# Bytes read from the upload stream per write
+CHUNK_SIZE = 1024 * 1024
+
+
+class StoredFile(NamedTuple):
+    # SHA-256 of the content, also the file name without extension
+    digest: str
+    # `<digest><extension>`, relative to the storage folder
+    filename: str
+    size: int
+    # False when a file with the same content was already stored
+    created: bool
+
+
+def store_upload(stream: BinaryIO, folder: str, extension: str, chunk_size: int = CHUNK_SIZE) -> StoredFile:
+    """
+    Stream an upload into content-addressed storage.
+
+    The content is hashed while it is copied chunk by chunk into a temporary file
+    in `folder`, which is then moved to `<sha256><extension>` with an atomic rename.
+    Identical content is stored once: when the target exists the temporary file is
+    discarded. Readers never see a partially written file.
+
+    Parameters:
+        stream: Readable binary stream, e.g. `FileStorage.stream`
+        folder: Storage directory, created if missing
+        extension: Extension including the dot, e.g. '.m4a'
+
+    Returns:
+        StoredFile
+    """
+    os.makedirs(folder, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    # Same directory as the target, so the rename stays on one filesystem
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                temp_file.write(chunk)
+                size += len(chunk)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+
+        filename = f'{digest.hexdigest()}{extension.lower()}'
+        target = os.path.join(folder, filename)
+        if os.path.exists(target):
+            os.unlink(temp_path)
+            return StoredFile(digest.hexdigest(), filename, size, False)
+        # mkstemp creates the file readable by its owner only
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, target)
+        return StoredFile(digest.hexdigest(), filename, size, True)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
@@ -0,0 +1,35 @@
+from typing import Any, Callable, Dict, List, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql, sqlite
+
+_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def upsert(executor, table: sa.Table, values: Union[Dict[str, Any], List[Dict[str, Any]]], key: List[str],
+           update: Callable[[sa.Table, Any], Dict[str, Any]]):
+    """
+    Insert `values` into `table`, or update the row with the same `key` columns,
+    as one atomic INSERT ... ON CONFLICT DO UPDATE statement.
+
+    Several rows can be given as a list; they must have distinct keys, and
+    should be sorted by key so concurrent upserts lock rows in the same order.
+
+    Parameters:
+        executor: Session or Connection to run the statement on (and in its transaction)
+        table: Target table, needs a unique constraint or primary key on `key`
+        values: Column values of the new row, or a list of rows
+        key: Columns identifying the row
+        update: Called with (table, excluded), returns the SET clause. Column
+            references on `table` read the existing row, on `excluded` the new values.
+    """
+    bind = executor.get_bind() if hasattr(executor, 'get_bind') else executor
+    dialect = bind.dialect.name
+    if dialect not in _INSERTS:
+        raise NotImplementedError(f'upsert is not supported on {dialect}')
+    statement = _INSERTS[dialect](table).values(values)
+    statement = statement.on_conflict_do_update(index_elements=key, set_=update(table, statement.excluded))
+    return executor.execute(statement)
@@ -0,0 +1,169 @@
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+import sqlalchemy as sa
+from config.extensions import db
+
+logger = logging.getLogger(__name__)
+
+
+def row_values(obj) -> Dict[str, Any]:
+    """
+    Column values set on a transient ORM object, keyed by column name, ready for
+    a Core insert. Unset columns are left out so their defaults apply.
+    """
+    state = sa.inspect(obj)
+    return {
+        prop.columns[0].name: state.dict[prop.key]
+        for prop in state.mapper.column_attrs
+        if prop.key in state.dict and not prop.columns[0].primary_key
+    }
+
+
+class _Entry:
+    __slots__ = ('row', 'children', 'future', 'queued_at')
+
+    def __init__(self, row, children):
+        self.row = row
+        self.children = children
+        self.future = Future()
+        self.queued_at = time.monotonic()
+
+
+class WriteBehindBuffer:
+    """
+    Groups single-row inserts into batched transactions.
+
+    Rows handed to `submit` are queued and written by a background thread once
+    `max_rows` rows are waiting or the oldest row has waited `interval` seconds,
+    whichever comes first: one multi-row INSERT for the parents, one for their
+    children, one COMMIT.
+
+    Durability: the Future returned by `submit` resolves to the new primary key
+    only after the transaction holding the row has committed, and fails with the
+    database error otherwise. A caller that waits on it before acknowledging the
+    client never reports a row that could still be lost. When a batch fails, its
+    rows are retried one transaction each so a single bad row only fails itself.
+
+    `on_insert`, when given, is called with the connection, the batch's rows and
+    their children inside the batch transaction, for bookkeeping that must commit
+    with the rows.
+
+    Pending rows are flushed by `close`, which is registered with atexit.
+    """
+
+    def __init__(self, app, table: sa.Table, child_table: Optional[sa.Table] = None,
+                 child_key: Optional[str] = None, interval: float = 0.005, max_rows: int = 100,
+                 on_insert: Optional[Callable[[sa.Connection, List[Dict[str, Any]], List[Dict[str, Any]]], None]] = None):
+        self._app = app
+        self._table = table
+        self._child_table = child_table
+        self._child_key = child_key
+        self._on_insert = on_insert
+        self._interval = interval
+        self._max_rows = max_rows
+        self._pending: List[_Entry] = []
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f'write-behind-{table.name}', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, row: Dict[str, Any], children: Optional[List[Dict[str, Any]]] = None) -> Future:
+        """
+        Queue `row` (and `children`, whose `child_key` column is filled in with the
+        new id) for the next batch.
+
+        Returns:
+            Future resolving to the committed row's primary key
+        """
+        entry = _Entry(row, children or [])
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f'Write-behind buffer for {self._table.name} is closed')
+            self._pending.append(entry)
+            self._cond.notify()
+        return entry.future
+
+    def close(self, timeout: float = 30.0):
+        """Stop accepting rows and wait until everything queued has been written"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error(f'Write-behind buffer for {self._table.name} did not drain within {timeout}s')
+
+    def _next_batch(self) -> List[_Entry]:
+        with self._cond:
+            while True:
+                if self._pending and (self._closed or len(self._pending) >= self._max_rows):
+                    break
+                if not self._pending:
+                    if self._closed:
+                        return []
+                    self._cond.wait()
+                    continue
+                remaining = self._pending[0].queued_at + self._interval - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self._max_rows]
+            del self._pending[:self._max_rows]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            with self._app.app_context():
+                self._write(batch)
+
+    def _write(self, batch: List[_Entry]):
+        try:
+            ids = self._insert(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].future.set_exception(e)
+                return
+            logger.warning(f'Batched insert of {len(batch)} {self._table.name} rows failed, retrying one by one: {e}')
+            for entry in batch:
+                self._write([entry])
+            return
+        for entry, new_id in zip(batch, ids):
+            entry.future.set_result(new_id)
+
+    def _insert(self, batch: List[_Entry]) -> List[int]:
+        """Insert `batch` in one transaction and return the new ids in batch order"""
+        ids = [None] * len(batch)
+        # A multi-row INSERT needs the same columns in every row
+        groups: Dict[frozenset, List[int]] = {}
+        for position, entry in enumerate(batch):
+            groups.setdefault(frozenset(entry.row), []).append(position)
+
+        with db.engine.begin() as connection:
+            for positions in groups.values():
+                statement = sa.insert(self._table).returning(
+                    self._table.c.id, sort_by_parameter_order=True)
+                result = connection.execute(statement, [batch[position].row for position in positions])
+                for position, new_id in zip(positions, result.scalars()):
+                    ids[position] = new_id
+
+            children = [
+                {**child, self._child_key: ids[position]}
+                for position, entry in enumerate(batch)
+                for child in entry.children
+            ]
+            if children:
+                connection.execute(sa.insert(self._child_table), children)
+            if self._on_insert is not None:
+                self._on_insert(connection, [entry.row for entry in batch], children)
+        logger.debug(f'Wrote {len(batch)} {self._table.name} rows in one transaction')
+        return ids